@@ -0,0 +1,18 @@
+"""
+ASGI entry point for API-only worker pods.
+
+Like asgi.py, but defaults to the API-only settings profile. With
+API_SKIP_OPTIONAL_PACKAGES=1 it also keeps DRF from importing the browsable
+API and schema extras (see event_manager.lean).
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+from event_manager.lean import skip_optional_packages
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'event_manager.settings_api')
+skip_optional_packages()
+
+application = get_asgi_application()
@@ -0,0 +1,55 @@
+import os
+import pickle
+import time
+import zlib
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.files import locks
+
+
+class LockingFileBasedCache(FileBasedCache):
+    """
+    FileBasedCache whose add() and incr()/decr() are atomic across processes.
+
+    Django's file backend implements both as a separate read and write, so
+    concurrent workers lose updates and shared counters drift. Here they run
+    under an exclusive lock on one of LOCK_STRIPES lock files in the cache
+    directory, chosen by key. incr() also keeps the key's expiry instead of
+    resetting it to the default timeout.
+    """
+
+    LOCK_STRIPES = 16
+
+    @contextmanager
+    def _locked(self, key, version):
+        self._createdir()
+        stripe = zlib.crc32(self.make_key(key, version).encode()) % self.LOCK_STRIPES
+        with open(os.path.join(self._dir, f'lock-{stripe}'), 'ab') as f:
+            locks.lock(f, locks.LOCK_EX)
+            try:
+                yield
+            finally:
+                locks.unlock(f)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._locked(key, version):
+            return super().add(key, value, timeout, version)
+
+    def incr(self, key, delta=1, version=None):
+        with self._locked(key, version):
+            try:
+                with open(self._key_to_file(key, version), 'rb') as f:
+                    expiry = pickle.load(f)
+                    value = pickle.loads(zlib.decompress(f.read()))
+            except FileNotFoundError:
+                raise ValueError(f"Key '{key}' not found") from None
+
+            now = time.time()
+            if expiry is not None and expiry <= now:
+                raise ValueError(f"Key '{key}' not found")
+
+            value += delta
+            self.set(key, value, None if expiry is None else expiry - now, version)
+            return value
@@ -0,0 +1,25 @@
+import os
+import sys
+
+# Optional packages that rest_framework.compat imports whenever they are
+# installed. They only serve the browsable API (markdown, pygments) and
+# schema generation (coreapi, coreschema, uritemplate, yaml), neither of
+# which the API-only profile offers.
+SKIPPED_PACKAGES = ['coreapi', 'coreschema', 'uritemplate', 'yaml', 'markdown', 'pygments']
+
+# Opt-in: blocking affects the whole worker process, not just DRF
+ENV_VAR = 'API_SKIP_OPTIONAL_PACKAGES'
+
+
+def skip_optional_packages():
+    """
+    Make DRF treat SKIPPED_PACKAGES as not installed in this process, when
+    API_SKIP_OPTIONAL_PACKAGES is set. Any other import of them in the
+    process (a library, a logging or gunicorn config loading yaml) then
+    raises ModuleNotFoundError, so only enable it on workers that need none.
+    """
+    if os.environ.get(ENV_VAR, '').lower() not in ('1', 'true', 'yes'):
+        return
+    for name in SKIPPED_PACKAGES:
+        # A None entry makes `import name` raise ModuleNotFoundError
+        sys.modules.setdefault(name, None)
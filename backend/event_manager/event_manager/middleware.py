@@ -0,0 +1,65 @@
+import re
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ACCEPTS_BR = re.compile(r'\bbr\b')
+ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+
+
+class CompressionMiddleware:
+    """
+    Brotli or gzip compress responses larger than RESPONSE_COMPRESSION_MIN_BYTES.
+
+    Brotli is used when the client accepts it and the optional ``brotli``
+    package is installed, otherwise gzip. Paths in
+    RESPONSE_COMPRESSION_EXCLUDE (auth endpoints returning tokens) are never
+    compressed, to stay clear of BREACH-style attacks.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_bytes = getattr(settings, 'RESPONSE_COMPRESSION_MIN_BYTES', 1024)
+        self.exclude = tuple(getattr(settings, 'RESPONSE_COMPRESSION_EXCLUDE', ()))
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if (
+            response.streaming
+            or response.has_header('Content-Encoding')
+            or len(response.content) < self.min_bytes
+            or request.path.startswith(self.exclude)
+        ):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+
+        if brotli is not None and ACCEPTS_BR.search(accept_encoding):
+            content = brotli.compress(response.content, quality=5)
+            encoding = 'br'
+        elif ACCEPTS_GZIP.search(accept_encoding):
+            content = compress_string(response.content, max_random_bytes=100)
+            encoding = 'gzip'
+        else:
+            return response
+
+        # Not worth it for incompressible bodies
+        if len(content) >= len(response.content):
+            return response
+
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = encoding
+        # Weaken strong ETags, the body is no longer byte-identical
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
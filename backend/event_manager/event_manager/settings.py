@@ -2,6 +2,7 @@ import os
 from pathlib import Path
 from datetime import timedelta
 from decouple import config
+from corsheaders.defaults import default_headers
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -26,6 +27,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'event_manager.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -71,10 +73,31 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'events.renderers.MessagePackRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 20
+    'PAGE_SIZE': 20,
+    # Token-bucket rates per scope (see events/throttling.py)
+    'DEFAULT_THROTTLE_RATES': {
+        'booking': config('THROTTLE_BOOKING_RATE', default='10/min'),
+        # Retries with a queue ticket; must allow one per Retry-After second
+        'booking_queue': config('THROTTLE_BOOKING_QUEUE_RATE', default='120/min'),
+        'register': config('THROTTLE_REGISTER_RATE', default='5/hour'),
+        'login': config('THROTTLE_LOGIN_RATE', default='10/min'),
+        'login_username': config('THROTTLE_LOGIN_USERNAME_RATE', default='30/hour'),
+    },
+    # Reverse proxies in front of the app; X-Forwarded-For is only trusted
+    # this many hops deep when keying anonymous throttles. 0 uses REMOTE_ADDR.
+    'NUM_PROXIES': config('NUM_PROXIES', default=0, cast=int),
 }
 
+# Responses smaller than this are sent uncompressed (see event_manager/middleware.py)
+RESPONSE_COMPRESSION_MIN_BYTES = 1024
+RESPONSE_COMPRESSION_EXCLUDE = ['/api/auth/']
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
@@ -86,6 +109,9 @@ CORS_ALLOWED_ORIGINS = [
     "http://127.0.0.1:3000",
 ]
 CORS_ALLOW_CREDENTIALS = True
+# Queue tickets handed out by book_ticket (see events/admission.py)
+CORS_ALLOW_HEADERS = (*default_headers, 'x-queue-ticket')
+CORS_EXPOSE_HEADERS = ['Retry-After', 'X-Queue-Ticket']
 
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
@@ -103,3 +129,45 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+SHARED_CACHE_DIR = config('SHARED_CACHE_LOCATION', default=os.path.join(BASE_DIR, 'cache'))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 100_000},
+    },
+    # Shared between worker processes on the same host, with atomic
+    # add/incr (see event_manager/cache.py). Across hosts point this at
+    # memcached/redis instead.
+    'shared': {
+        'BACKEND': 'event_manager.cache.LockingFileBasedCache',
+        'LOCATION': SHARED_CACHE_DIR,
+        # Every set() lists the directory to decide whether to cull
+        'OPTIONS': {'MAX_ENTRIES': 20_000},
+    },
+    # Throttle buckets with THROTTLE_STORE=cache. A separate alias, so
+    # clearing the buckets never touches admission state in `shared`
+    'throttle': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': config('THROTTLE_CACHE_LOCATION', default=os.path.join(SHARED_CACHE_DIR, 'throttle')),
+        'OPTIONS': {'MAX_ENTRIES': 20_000},
+    },
+}
+
+# Waiting-room / admission control for book_ticket (see events/admission.py)
+EVENT_ADMISSION = {
+    'CACHE_ALIAS': config('ADMISSION_CACHE', default='shared'),
+    'MAX_IN_FLIGHT': config('ADMISSION_MAX_IN_FLIGHT', default=8, cast=int),
+    'AVERAGE_BOOKING_SECONDS': 0.05,
+    'SOLD_OUT_TTL': 5,
+    # A worker killed mid-booking frees its slot after this long
+    'SLOT_LEASE_SECONDS': config('ADMISSION_SLOT_LEASE_SECONDS', default=30, cast=int),
+}
+
+# Throttle bucket store: 'memory' (per process) or 'cache' (CACHE_ALIAS, shared by workers)
+EVENT_THROTTLE = {
+    'STORE': config('THROTTLE_STORE', default='memory'),
+    'CACHE_ALIAS': 'throttle',
+    'SHARDS': 16,
+}
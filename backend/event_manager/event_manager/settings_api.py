@@ -0,0 +1,38 @@
+"""
+API-only settings profile for worker pods.
+
+Served by event_manager.wsgi_api / event_manager.asgi_api. Skips the admin,
+sessions, messages, staticfiles and template machinery that the JSON API
+never touches, so workers cold-start faster. Everything else (database,
+JWT, CORS, caches) comes from the default settings.
+"""
+from .settings import *  # noqa: F401,F403
+
+INSTALLED_APPS = [
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'rest_framework',
+    'rest_framework_simplejwt',
+    'corsheaders',
+    'events',
+]
+
+MIDDLEWARE = [
+    'corsheaders.middleware.CorsMiddleware',
+    'event_manager.middleware.CompressionMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.middleware.common.CommonMiddleware',
+]
+
+ROOT_URLCONF = 'event_manager.urls_api'
+
+TEMPLATES = []
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,  # noqa: F405
+    # The browsable API needs templates; workers only speak JSON and msgpack
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'events.renderers.MessagePackRenderer',
+    ],
+}
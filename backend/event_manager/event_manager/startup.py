@@ -0,0 +1,147 @@
+"""
+Cold-start measurement for the settings profiles.
+
+Each measurement runs in a fresh interpreter: it imports the profile's WSGI
+entry point (Django setup, app registry, middleware) and serves one request
+that goes through the URLconf, DRF and simplejwt without needing the database.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from event_manager import lean
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+# name -> (settings module, WSGI entry point)
+PROFILES = {
+    'full': ('event_manager.settings', 'event_manager.wsgi'),
+    'api': ('event_manager.settings_api', 'event_manager.wsgi_api'),
+}
+# Extra environment per profile; the api profile is measured as deployed
+PROFILE_ENV = {
+    'api': {lean.ENV_VAR: '1'},
+}
+
+# Modules an API-only worker must not pay for at startup. The
+# django.contrib.admin package and the template engine classes are still
+# imported: django.forms (Django core) imports django.template, and
+# rest_framework.views imports rest_framework.schemas, which reaches
+# django.contrib.admin through django.contrib.admindocs. No admin app,
+# admin site, ModelAdmin or template loader is set up, though.
+API_FORBIDDEN_MODULES = [
+    'django.contrib.admin.apps',
+    'django.contrib.auth.admin',
+    'django.contrib.sessions',
+    'django.contrib.messages.middleware',
+    'django.contrib.staticfiles',
+    'django.template.loaders',
+    'events.admin',
+    # Browsable API and schema extras, skipped by event_manager.lean when enabled
+    'yaml',
+    'pygments',
+    'markdown',
+    # Image handling is only needed when an upload is validated
+    'PIL',
+    # Imported by djangorestframework-simplejwt < 5.3, ~100ms on its own
+    'pkg_resources',
+]
+
+# Absolute regression budgets for the api profile, checked by
+# events.tests.StartupTests only when set: both depend on the machine and
+# the installed package versions. Here the api profile measures ~730
+# modules and ~0.4s to first response; 750 and 0.6 are sensible settings.
+def _budget(name, cast):
+    value = os.environ.get(name)
+    return cast(value) if value else None
+
+
+API_MODULE_BUDGET = _budget('STARTUP_MODULE_BUDGET', int)
+STARTUP_BUDGET_SECONDS = _budget('STARTUP_BUDGET_SECONDS', float)
+
+PROBE = r'''
+import importlib, io, json, sys, time
+started = time.perf_counter()
+application = importlib.import_module(sys.argv[1]).application
+imported = time.perf_counter()
+
+body = b'{"refresh": "not-a-token"}'
+environ = {
+    'REQUEST_METHOD': 'POST',
+    'PATH_INFO': '/api/auth/token/refresh/',
+    'SERVER_NAME': 'localhost',
+    'SERVER_PORT': '80',
+    'HTTP_HOST': 'localhost',
+    'CONTENT_TYPE': 'application/json',
+    'CONTENT_LENGTH': str(len(body)),
+    'wsgi.input': io.BytesIO(body),
+    'wsgi.url_scheme': 'http',
+    'wsgi.errors': sys.stderr,
+}
+statuses = []
+response = application(environ, lambda status, headers: statuses.append(status))
+b''.join(response)
+responded = time.perf_counter()
+
+print(json.dumps({
+    'import_seconds': imported - started,
+    'first_response_seconds': responded - started,
+    'status': statuses[0],
+    # None entries are imports blocked by event_manager.lean
+    'modules': sorted(name for name, module in sys.modules.items() if module is not None),
+}))
+'''
+
+
+def measure(settings_module, entry_point, env=None):
+    process_env = dict(os.environ, **(env or {}))
+    process_env['DJANGO_SETTINGS_MODULE'] = settings_module
+    process_env['PYTHONPATH'] = os.pathsep.join(
+        filter(None, [str(PROJECT_DIR), process_env.get('PYTHONPATH')])
+    )
+
+    started = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, '-c', PROBE, entry_point],
+        cwd=PROJECT_DIR,
+        env=process_env,
+        capture_output=True,
+        text=True,
+    )
+    if process.returncode != 0:
+        raise RuntimeError(f'Startup probe failed for {settings_module}:\n{process.stderr}')
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    result['process_seconds'] = time.perf_counter() - started
+    return result
+
+
+def summarize(results):
+    return {
+        'import_seconds': statistics.median(r['import_seconds'] for r in results),
+        'first_response_seconds': statistics.median(r['first_response_seconds'] for r in results),
+        'first_response_runs': [r['first_response_seconds'] for r in results],
+        'process_seconds': statistics.median(r['process_seconds'] for r in results),
+        'module_count': len(results[0]['modules']),
+        'modules': results[0]['modules'],
+        'status': results[0]['status'],
+    }
+
+
+def compare_profiles(runs=5, env=None):
+    """
+    Summaries per profile. Runs of the profiles are interleaved, alternating
+    which goes first, so machine noise hits every profile alike and run i of
+    one profile can be compared with run i of another.
+    """
+    results = {name: [] for name in PROFILES}
+    for run in range(runs):
+        names = list(PROFILES) if run % 2 == 0 else list(reversed(PROFILES))
+        for name in names:
+            settings_module, entry_point = PROFILES[name]
+            profile_env = dict(env or {}, **PROFILE_ENV.get(name, {}))
+            results[name].append(measure(settings_module, entry_point, profile_env))
+    return {name: summarize(profile_results) for name, profile_results in results.items()}
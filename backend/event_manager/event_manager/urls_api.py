@@ -0,0 +1,12 @@
+"""
+URL configuration for the API-only settings profile (no admin, no media).
+"""
+from django.urls import path, include
+from rest_framework_simplejwt.views import TokenRefreshView
+from events.views import LoginView
+
+urlpatterns = [
+    path('api/auth/token/', LoginView.as_view(), name='token_obtain_pair'),
+    path('api/auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('api/', include('events.urls')),
+]
@@ -1,15 +1,18 @@
 from django.contrib import admin
-from .models import Event, Booking
+from .models import Event, Booking, SimilarityBuild
 
 @admin.register(Event)
 class EventAdmin(admin.ModelAdmin):
     list_display = ['title', 'date', 'location', 'tickets_available', 'is_upcoming_display', 'is_past_display', 'status_display', 'can_book_display', 'created_at']
-    list_filter = ['date', 'location', 'created_at']
+    list_filter = ['lifecycle_state', 'date', 'location', 'created_at']
     search_fields = ['title', 'location', 'description']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['lifecycle_state', 'geohash', 'created_at', 'updated_at']
     fieldsets = (
         ('Event Information', {
-            'fields': ('title', 'description', 'date', 'location')
+            'fields': ('title', 'description', 'date', 'lifecycle_state', 'location')
+        }),
+        ('Coordinates', {
+            'fields': ('latitude', 'longitude', 'geohash')
         }),
         ('Tickets & Media', {
             'fields': ('tickets_available', 'thumbnail', 'image')
@@ -21,17 +24,17 @@ class EventAdmin(admin.ModelAdmin):
     )
     
     def is_upcoming_display(self, obj):
-        return obj.is_upcoming()
+        return obj.lifecycle_state != Event.PAST
     is_upcoming_display.boolean = True
     is_upcoming_display.short_description = 'Upcoming'
     
     def is_past_display(self, obj):
-        return obj.is_past()
+        return obj.lifecycle_state == Event.PAST
     is_past_display.boolean = True
     is_past_display.short_description = 'Past Event'
     
     def status_display(self, obj):
-        status = obj.get_status()
+        status = obj.lifecycle_state
         status_display_map = {
             'unscheduled': '⏳ Unscheduled',
             'past': '⏰ Past',
@@ -54,6 +57,11 @@ class BookingAdmin(admin.ModelAdmin):
     readonly_fields = ['booked_at']
     
     def event_is_past(self, obj):
-        return obj.event.is_past()
+        return obj.event.lifecycle_state == Event.PAST
     event_is_past.boolean = True
-    event_is_past.short_description = 'Event Ended'
\ No newline at end of file
+    event_is_past.short_description = 'Event Ended'
+
+@admin.register(SimilarityBuild)
+class SimilarityBuildAdmin(admin.ModelAdmin):
+    list_display = ['started_at', 'finished_at', 'events_count', 'bookings_count', 'events_updated']
+    readonly_fields = ['started_at', 'finished_at', 'events_count', 'bookings_count', 'events_updated']
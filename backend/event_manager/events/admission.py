@@ -0,0 +1,250 @@
+import math
+import time
+import uuid
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+
+# Per-event admission control for book_ticket.
+#
+# All state lives in a Django cache so the same code works in-process
+# (LocMemCache) and across worker processes on one host (the `shared`
+# LockingFileBasedCache, or any backend with atomic add/incr). Keys are
+# namespaced per event:
+#   soldout   - set once tickets_available hits zero, lets us answer 409
+#               without touching the database. Expires after SOLD_OUT_TTL,
+#               so a marker missed by a resync is short-lived
+#   limit     - max concurrent booking transactions for the event
+#   slot:N    - lease on in-flight slot N (0 <= N < limit), held by a running
+#               booking transaction. Leases expire after SLOT_LEASE_SECONDS,
+#               so a worker killed mid-booking frees its slot within that
+#               time instead of wedging the event
+#   issued    - last queue ticket handed out
+#   serving   - queue tickets up to this number may take a free slot
+#   called    - when `serving` last moved on (time.time())
+#   avg       - moving average of booking transaction time (seconds)
+#
+# Queueing: a request turned away gets a signed queue ticket that it sends
+# back on retry (X-Queue-Ticket header or `queue_ticket` field). While a
+# queue exists, newcomers join at the back, and a ticket is only admitted
+# once `serving` reaches it. `serving` moves on by one for every finished
+# booking. Called tickets keep their turn for QUEUE_TURN_SECONDS; after
+# that a free slot goes to the first ticket holder who asks, so tickets
+# that are never used again do not stall the queue.
+#
+# The cache is resynced by the Event post_save/post_delete signals.
+# QuerySet.update() on tickets_available sends no signal; call
+# get_controller().sync(event) after such updates.
+
+DEFAULTS = {
+    'CACHE_ALIAS': 'shared',
+    'MAX_IN_FLIGHT': 8,
+    'AVERAGE_BOOKING_SECONDS': 0.05,
+    'SOLD_OUT_TTL': 5,
+    'QUEUE_TURN_SECONDS': 3,
+    'SLOT_LEASE_SECONDS': 30,
+    'KEY_TIMEOUT': 60 * 60 * 24,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'EVENT_ADMISSION', {}).get(name, DEFAULTS[name])
+
+
+# Queue ticket sent back by a client: X-Queue-Ticket header or
+# `queue_ticket` in the body
+def request_ticket(request):
+    ticket = request.headers.get('X-Queue-Ticket')
+    if ticket is None and hasattr(request.data, 'get'):
+        ticket = request.data.get('queue_ticket')
+    return ticket
+
+
+class SoldOut(Exception):
+    pass
+
+
+class QueueFull(Exception):
+    def __init__(self, position, estimated_wait, ticket):
+        super().__init__(position, estimated_wait, ticket)
+        self.position = position
+        self.estimated_wait = estimated_wait
+        self.ticket = ticket
+
+
+class AdmissionController:
+    def __init__(self, cache=None, max_in_flight=None, turn_seconds=None):
+        self.cache = cache or caches[get_setting('CACHE_ALIAS')]
+        self.max_in_flight = max_in_flight or get_setting('MAX_IN_FLIGHT')
+        self.sold_out_ttl = get_setting('SOLD_OUT_TTL')
+        self.turn_seconds = get_setting('QUEUE_TURN_SECONDS') if turn_seconds is None else turn_seconds
+        self.slot_lease = get_setting('SLOT_LEASE_SECONDS')
+        self.timeout = get_setting('KEY_TIMEOUT')
+        self.signer = signing.Signer(salt='events.admission')
+
+    def _key(self, event_id, name):
+        return f'admission:{event_id}:{name}'
+
+    def _get(self, event_id, name, default=0):
+        value = self.cache.get(self._key(event_id, name))
+        return default if value is None else value
+
+    def _incr(self, event_id, name, delta=1):
+        key = self._key(event_id, name)
+        # add() is a no-op when the key already exists, so this is safe to race
+        self.cache.add(key, 0, self.timeout)
+        try:
+            return self.cache.incr(key, delta)
+        except ValueError:
+            # Key expired between add() and incr()
+            self.cache.set(key, delta, self.timeout)
+            return delta
+
+    # Lease the first free slot below limit; returns (slot, token) or None.
+    # add() only succeeds for a missing or expired key, so two requests
+    # never hold the same slot.
+    def _take_slot(self, event_id, limit):
+        token = uuid.uuid4().hex
+        for slot in range(limit):
+            if self.cache.add(self._key(event_id, f'slot:{slot}'), token, self.slot_lease):
+                return slot, token
+        return None
+
+    # Give back a leased slot. Once the lease has expired another request
+    # may hold the slot, so it is only deleted while it still carries our
+    # token.
+    def _release_slot(self, event_id, lease):
+        slot, token = lease
+        key = self._key(event_id, f'slot:{slot}')
+        if self.cache.get(key) == token:
+            self.cache.delete(key)
+
+    def in_flight(self, event_id):
+        keys = [self._key(event_id, f'slot:{slot}') for slot in range(self.max_in_flight)]
+        return len(self.cache.get_many(keys))
+
+    # Limit is driven by tickets_available: never run more concurrent
+    # transactions than there are tickets left to sell
+    def limit_for(self, tickets_available):
+        return max(1, min(self.max_in_flight, tickets_available))
+
+    def is_sold_out(self, event_id):
+        return bool(self.cache.get(self._key(event_id, 'soldout')))
+
+    # Sync cached state with the event's current ticket count
+    def sync(self, event):
+        if event.tickets_available <= 0:
+            self.cache.set(self._key(event.pk, 'soldout'), True, self.sold_out_ttl)
+        else:
+            limit = self.limit_for(event.tickets_available)
+            self.cache.delete(self._key(event.pk, 'soldout'))
+            self.cache.set(self._key(event.pk, 'limit'), limit, self.timeout)
+            # Slots above the new limit are never handed out again; drop
+            # their leases so in_flight() matches what admit() sees
+            self.cache.delete_many([
+                self._key(event.pk, f'slot:{slot}') for slot in range(limit, self.max_in_flight)
+            ])
+
+    def clear(self, event_id):
+        self.cache.delete_many([
+            self._key(event_id, name)
+            for name in ('soldout', 'limit', 'issued', 'serving', 'called', 'avg')
+        ] + [self._key(event_id, f'slot:{slot}') for slot in range(self.max_in_flight)])
+
+    def estimated_wait(self, event_id, position):
+        limit = self._get(event_id, 'limit', self.max_in_flight)
+        average = self._get(event_id, 'avg', get_setting('AVERAGE_BOOKING_SECONDS'))
+        return math.ceil(position / limit) * average
+
+    def sign_ticket(self, event_id, number):
+        return self.signer.sign(f'{event_id}:{number}')
+
+    # Queue number carried by a ticket for event_id, or None when the
+    # ticket is missing, forged, for another event or from a reset queue
+    def ticket_number(self, event_id, ticket):
+        if not ticket:
+            return None
+        try:
+            ticket_event, number = self.signer.unsign(ticket).split(':')
+        except (signing.BadSignature, ValueError):
+            return None
+        if ticket_event != str(event_id) or not 0 < int(number) <= self._get(event_id, 'issued'):
+            return None
+        return int(number)
+
+    # Let tickets up to serving + steps take a free slot
+    def _call(self, event_id, steps):
+        self.cache.set(self._key(event_id, 'called'), time.time(), self.timeout)
+        return self._incr(event_id, 'serving', steps)
+
+    def _queued(self, event_id, number, serving):
+        position = max(1, number - serving)
+        return QueueFull(position, self.estimated_wait(event_id, position), self.sign_ticket(event_id, number))
+
+    # Reserve an in-flight slot for event_id. Raises SoldOut or QueueFull
+    # without touching the database; otherwise returns an Admission that
+    # must be released when the booking transaction finishes.
+    def admit(self, event_id, ticket=None):
+        if self.is_sold_out(event_id):
+            raise SoldOut()
+
+        number = self.ticket_number(event_id, ticket)
+        serving = self._get(event_id, 'serving')
+        if number is None and self._get(event_id, 'issued') > serving:
+            # Others are already waiting: join the back of the queue
+            raise self._queued(event_id, self._incr(event_id, 'issued'), serving)
+
+        lease = self._take_slot(event_id, self._get(event_id, 'limit', self.max_in_flight))
+        if lease is None:
+            if number is None:
+                number = self._incr(event_id, 'issued')
+            raise self._queued(event_id, number, serving)
+
+        if number is not None and number > serving:
+            if time.time() - self._get(event_id, 'called') < self.turn_seconds:
+                # Tickets ahead of this one were called recently; hold their slot
+                self._release_slot(event_id, lease)
+                raise self._queued(event_id, number, serving)
+            # Their turn went unclaimed: this ticket takes the free slot
+            self._call(event_id, number - serving)
+
+        return Admission(self, event_id, lease)
+
+    def release(self, event_id, elapsed, lease):
+        self._release_slot(event_id, lease)
+        if self._get(event_id, 'issued') > self._get(event_id, 'serving'):
+            self._call(event_id, 1)
+
+        key = self._key(event_id, 'avg')
+        average = self.cache.get(key)
+        if average is None:
+            average = elapsed
+        else:
+            average = 0.8 * average + 0.2 * elapsed
+        self.cache.set(key, average, self.timeout)
+
+
+class Admission:
+    def __init__(self, controller, event_id, lease):
+        self.controller = controller
+        self.event_id = event_id
+        self.lease = lease
+        self.started = time.monotonic()
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.controller.release(self.event_id, time.monotonic() - self.started, self.lease)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+        return False
+
+
+def get_controller():
+    return AdmissionController()
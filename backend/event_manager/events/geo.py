@@ -0,0 +1,210 @@
+import math
+
+from django.db.models import Q
+
+# Geohash helpers for the nearby/bounding-box event queries.
+#
+# Events store a geohash of their coordinates in an ordinary B-tree indexed
+# column. Every point inside a geohash cell has a geohash starting with the
+# cell's hash, so "events in this cell" is a single index range scan
+# (geohash >= cell AND geohash < next cell) and no PostGIS is required.
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+DECODE_MAP = {char: index for index, char in enumerate(BASE32)}
+
+GEOHASH_PRECISION = 9  # ~5m cells, stored on Event
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+MAX_RADIUS_KM = 2500.0
+
+
+def encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(chars) < precision:
+        if even:
+            mid = (lng_range[0] + lng_range[1]) / 2
+            if longitude >= mid:
+                bits = (bits << 1) | 1
+                lng_range[0] = mid
+            else:
+                bits = bits << 1
+                lng_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits = bits << 1
+                lat_range[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return ''.join(chars)
+
+
+# Return (min_lat, min_lng, max_lat, max_lng) of a geohash cell
+def decode_bounds(geohash):
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    even = True
+
+    for char in geohash:
+        value = DECODE_MAP[char]
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            target = lng_range if even else lat_range
+            mid = (target[0] + target[1]) / 2
+            if bit:
+                target[0] = mid
+            else:
+                target[1] = mid
+            even = not even
+
+    return lat_range[0], lng_range[0], lat_range[1], lng_range[1]
+
+
+# Size of a cell at the given precision, in degrees (lat, lng)
+def cell_size(precision):
+    lng_bits = math.ceil(5 * precision / 2)
+    lat_bits = math.floor(5 * precision / 2)
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lng_bits)
+
+
+def is_valid_point(latitude, longitude):
+    return (
+        math.isfinite(latitude) and math.isfinite(longitude)
+        and -90.0 <= latitude <= 90.0 and -180.0 <= longitude <= 180.0
+    )
+
+
+def wrap_longitude(longitude):
+    return (longitude + 180.0) % 360.0 - 180.0
+
+
+# The cell containing the point plus its eight neighbours
+def neighbours(geohash):
+    min_lat, min_lng, max_lat, max_lng = decode_bounds(geohash)
+    lat_step = max_lat - min_lat
+    lng_step = max_lng - min_lng
+    center_lat = (min_lat + max_lat) / 2
+    center_lng = (min_lng + max_lng) / 2
+
+    cells = set()
+    for dlat in (-1, 0, 1):
+        lat = center_lat + dlat * lat_step
+        if lat < -90.0 or lat > 90.0:
+            continue
+        for dlng in (-1, 0, 1):
+            lng = wrap_longitude(center_lng + dlng * lng_step)
+            cells.add(encode(lat, lng, len(geohash)))
+    return sorted(cells)
+
+
+# Pick the finest precision whose cells are at least radius_km across, so
+# a circle of that radius fits inside the 3x3 block around its center
+def precision_for_radius(radius_km, latitude):
+    lng_scale = max(math.cos(math.radians(latitude)), 0.01)
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        lat_deg, lng_deg = cell_size(precision)
+        if (lat_deg * KM_PER_DEGREE >= radius_km
+                and lng_deg * KM_PER_DEGREE * lng_scale >= radius_km):
+            return precision
+    return 1
+
+
+def cells_for_radius(latitude, longitude, radius_km):
+    precision = precision_for_radius(radius_km, latitude)
+    return neighbours(encode(latitude, longitude, precision))
+
+
+# Cover a bounding box with at most max_cells geohash cells
+def cells_for_bbox(min_lat, min_lng, max_lat, max_lng, max_cells=32):
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        lat_deg, lng_deg = cell_size(precision)
+        rows = math.floor(max_lat / lat_deg) - math.floor(min_lat / lat_deg) + 1
+        cols = math.floor(max_lng / lng_deg) - math.floor(min_lng / lng_deg) + 1
+        if rows * cols > max_cells:
+            continue
+
+        cells = set()
+        for row in range(rows):
+            lat = min(min_lat + row * lat_deg, max_lat)
+            for col in range(cols):
+                lng = min(min_lng + col * lng_deg, max_lng)
+                cells.add(encode(lat, lng, precision))
+        # Include the far edges, which stepping may land short of
+        for lat in (min_lat, max_lat):
+            for lng in (min_lng, max_lng):
+                cells.add(encode(lat, lng, precision))
+        return sorted(cells)
+    return ['']
+
+
+# Smallest string greater than every geohash starting with prefix, or
+# None when there is none ('zzz...'). Used as the exclusive upper bound of
+# an index range scan instead of LIKE, which needs a special operator class.
+def prefix_upper_bound(prefix):
+    chars = list(prefix)
+    while chars:
+        index = DECODE_MAP[chars[-1]]
+        if index + 1 < len(BASE32):
+            chars[-1] = BASE32[index + 1]
+            return ''.join(chars)
+        chars.pop()
+    return None
+
+
+# OR of index range scans, one per cell
+def cells_q(cells, field='geohash'):
+    query = Q()
+    for cell in cells:
+        condition = Q(**{f'{field}__gte': cell})
+        upper = prefix_upper_bound(cell)
+        if upper is not None:
+            condition &= Q(**{f'{field}__lt': upper})
+        query |= condition
+    return query
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    dlat = lat2 - lat1
+    dlng = lng2 - lng1
+    a = math.sin(dlat / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+# Nearest rows of queryset to (latitude, longitude) as [(distance_km, pk)].
+# With a radius only that circle is searched; otherwise the search radius
+# doubles from initial_radius_km until limit rows are found.
+def nearest(queryset, latitude, longitude, limit, radius_km=None,
+            initial_radius_km=10.0, max_radius_km=MAX_RADIUS_KM):
+    search_radius = radius_km or initial_radius_km
+    while True:
+        lat_delta = search_radius / KM_PER_DEGREE
+        candidates = queryset.filter(
+            cells_q(cells_for_radius(latitude, longitude, search_radius)),
+            latitude__range=(latitude - lat_delta, latitude + lat_delta),
+        ).order_by().values_list('pk', 'latitude', 'longitude')
+
+        found = []
+        for pk, lat, lng in candidates:
+            distance = haversine_km(latitude, longitude, lat, lng)
+            if distance <= search_radius:
+                found.append((distance, pk))
+        found.sort()
+
+        if radius_km or len(found) >= limit or search_radius >= max_radius_km:
+            return found[:limit]
+        search_radius = min(search_radius * 2, max_radius_km)
@@ -0,0 +1,85 @@
+from datetime import timedelta
+
+from django.db.models import Min
+from django.utils import timezone
+
+from .models import Event
+
+# Keeps Event.lifecycle_state in step with the clock.
+#
+# Event.get_status() compares dates in UTC, so the state only changes at
+# two kinds of instants: an event's start time (today -> past) and UTC
+# midnight (upcoming -> today). advance() applies every transition that
+# is due with batched UPDATEs on the (lifecycle_state, date) index and
+# next_transition() tells the scheduler when to wake up next. Updates go
+# through QuerySet.update(), so updated_at and post_save are untouched.
+
+
+def start_of_tomorrow(now):
+    return now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+
+
+def _update_in_batches(queryset, state, batch_size):
+    updated = 0
+    while True:
+        pks = list(queryset.order_by().values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return updated
+        updated += Event.objects.filter(pk__in=pks).update(lifecycle_state=state)
+
+
+def advance(now=None, batch_size=1000):
+    """Apply all transitions due at `now`. Returns {state: events moved into it}."""
+    now = now or timezone.now()
+    tomorrow = start_of_tomorrow(now)
+    return {
+        Event.PAST: _update_in_batches(
+            Event.objects.filter(lifecycle_state__in=Event.NOT_STARTED_STATES, date__lt=now),
+            Event.PAST,
+            batch_size,
+        ),
+        Event.TODAY: _update_in_batches(
+            Event.objects.filter(lifecycle_state=Event.UPCOMING, date__gte=now, date__lt=tomorrow),
+            Event.TODAY,
+            batch_size,
+        ),
+    }
+
+
+def next_transition(now=None):
+    """When the next stored state is due to change."""
+    now = now or timezone.now()
+    next_start = Event.objects.filter(
+        lifecycle_state=Event.TODAY
+    ).aggregate(next_start=Min('date'))['next_start']
+    tomorrow = start_of_tomorrow(now)
+    if next_start is None:
+        return tomorrow
+    return min(next_start, tomorrow)
+
+
+def rebuild(now=None, batch_size=1000):
+    """Recompute every event's state from its date. Returns {state: events moved into it}."""
+    now = now or timezone.now()
+    tomorrow = start_of_tomorrow(now)
+    ranges = {
+        Event.UNSCHEDULED: {'date__isnull': True},
+        Event.PAST: {'date__lt': now},
+        Event.TODAY: {'date__gte': now, 'date__lt': tomorrow},
+        Event.UPCOMING: {'date__gte': tomorrow},
+    }
+    return {
+        state: _update_in_batches(
+            Event.objects.filter(**lookup).exclude(lifecycle_state=state), state, batch_size
+        )
+        for state, lookup in ranges.items()
+    }
+
+
+def verify(chunk_size=2000):
+    """Yield (event, stored_state, live_state) for events whose stored state is wrong."""
+    events = Event.objects.only('id', 'title', 'date', 'lifecycle_state').order_by()
+    for event in events.iterator(chunk_size=chunk_size):
+        live = event.get_status()
+        if event.lifecycle_state != live:
+            yield event, event.lifecycle_state, live
@@ -0,0 +1,155 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from events.admission import AdmissionController, SoldOut, QueueFull
+
+
+class SimulatedDatabase:
+    """Stands in for the booking transaction: one ticket row behind a lock."""
+
+    def __init__(self, tickets, transaction_seconds):
+        self.tickets = tickets
+        self.transaction_seconds = transaction_seconds
+        self.transactions = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.lock = threading.Lock()
+
+    def book(self):
+        with self.lock:
+            self.transactions += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        time.sleep(self.transaction_seconds)
+        with self.lock:
+            self.in_flight -= 1
+            if self.tickets > 0:
+                self.tickets -= 1
+                return self.tickets
+            return None
+
+
+class Command(BaseCommand):
+    help = 'Simulate a flash sale and report DB transactions saved by admission control'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--tickets', type=int, default=100)
+        parser.add_argument('--max-in-flight', type=int, default=8)
+        parser.add_argument('--attempts', type=int, default=50,
+                            help='Attempts per user before giving up; each retry waits estimated_wait')
+        parser.add_argument('--transaction-ms', type=float, default=2.0)
+        parser.add_argument('--threads', type=int, default=64)
+        parser.add_argument('--cache', help='Cache alias for admission state (default: a private LocMemCache)')
+        parser.add_argument('--turn-ms', type=float, default=100.0, help='How long a called queue ticket keeps its turn')
+
+    def handle(self, *args, **options):
+        baseline = self.run(options, admission=False)
+        guarded = self.run(options, admission=True)
+
+        self.stdout.write(f"{'':<22}{'without':>12}{'with':>12}")
+        for label, key in [
+            ('DB transactions', 'transactions'),
+            ('peak in-flight', 'peak'),
+            ('tickets sold', 'sold'),
+            ('409 sold out', 'sold_out'),
+            ('429 queued', 'queued'),
+            ('wall time (s)', 'elapsed'),
+        ]:
+            self.stdout.write(f'{label:<22}{baseline[key]:>12}{guarded[key]:>12}')
+
+        self.stdout.write(f"{'users gave up':<22}{baseline['gave_up']:>12}{guarded['gave_up']:>12}")
+
+        # Fewer transactions only count as savings if the same tickets sold
+        if guarded['sold'] != baseline['sold']:
+            self.stdout.write(self.style.ERROR(
+                f"Not comparable: {baseline['sold'] - guarded['sold']} fewer tickets sold with "
+                f"admission control ({options['tickets'] - guarded['sold']} unsold). "
+                f"Raise --attempts."
+            ))
+            return
+        saved = baseline['transactions'] - guarded['transactions']
+        percent = 100.0 * saved / baseline['transactions'] if baseline['transactions'] else 0.0
+        self.stdout.write(self.style.SUCCESS(
+            f"DB transactions saved: {saved} ({percent:.1f}%), {guarded['sold']} tickets sold in both runs"
+        ))
+
+    def run(self, options, admission):
+        db = SimulatedDatabase(options['tickets'], options['transaction_ms'] / 1000.0)
+        controller = AdmissionController(
+            cache=caches[options['cache']] if options['cache'] else LocMemCache('bench-flash-sale', {}),
+            max_in_flight=options['max_in_flight'],
+            turn_seconds=options['turn_ms'] / 1000.0
+        )
+        event = SimpleNamespace(pk=1, tickets_available=options['tickets'])
+        controller.clear(event.pk)
+        controller.sync(event)
+
+        counts = {'sold_out': 0, 'queued': 0, 'gave_up': 0}
+        counts_lock = threading.Lock()
+        users = iter(range(options['users']))
+        users_lock = threading.Lock()
+
+        def attempt(ticket):
+            if not admission:
+                # Every request reaches the database, sold out or not
+                db.book()
+                return True, None
+
+            try:
+                slot = controller.admit(event.pk, ticket)
+            except SoldOut:
+                with counts_lock:
+                    counts['sold_out'] += 1
+                return True, None
+            except QueueFull as e:
+                with counts_lock:
+                    counts['queued'] += 1
+                # Wait as told and retry with the ticket, as a client
+                # following estimated_wait and sending X-Queue-Ticket would
+                time.sleep(e.estimated_wait)
+                return False, e.ticket
+
+            with slot:
+                remaining = db.book()
+                # Like the view: resync after a sale, or when the DB says sold out
+                event.tickets_available = 0 if remaining is None else remaining
+                controller.sync(event)
+                return remaining is not None, None
+
+        def worker():
+            while True:
+                with users_lock:
+                    if next(users, None) is None:
+                        return
+                ticket = None
+                for _ in range(options['attempts']):
+                    done, ticket = attempt(ticket)
+                    if done:
+                        break
+                else:
+                    with counts_lock:
+                        counts['gave_up'] += 1
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        return {
+            'transactions': db.transactions,
+            'peak': db.peak_in_flight,
+            'sold': options['tickets'] - db.tickets,
+            'sold_out': counts['sold_out'],
+            'queued': counts['queued'],
+            'gave_up': counts['gave_up'],
+            'elapsed': round(elapsed, 2),
+        }
@@ -0,0 +1,142 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from events import geo
+from events.models import Event
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the geohash nearby query against a full scan (rows are rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=1_000_000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--scan-queries', type=int, default=3)
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        try:
+            with transaction.atomic():
+                self.populate(options['events'], options['batch_size'])
+                # Planner statistics, as a live table would have. Without them
+                # the state filter's index can win over the geohash ranges.
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+                self.run(options)
+                raise Rollback()
+        except Rollback:
+            pass
+
+    # Half the events cluster around a few hundred "cities", the rest are
+    # spread uniformly, roughly like real listings
+    def random_point(self, cities):
+        if self.rng.random() < 0.5:
+            lat, lng = self.rng.choice(cities)
+            return (
+                max(-90.0, min(90.0, lat + self.rng.gauss(0, 0.2))),
+                geo.wrap_longitude(lng + self.rng.gauss(0, 0.2)),
+            )
+        return self.rng.uniform(-60, 70), self.rng.uniform(-180, 180)
+
+    def populate(self, count, batch_size):
+        self.cities = [(self.rng.uniform(-50, 60), self.rng.uniform(-180, 180)) for _ in range(300)]
+        now = timezone.now()
+        started = time.perf_counter()
+        batch = []
+        for i in range(count):
+            lat, lng = self.random_point(self.cities)
+            event = Event(
+                title=f'Bench event {i}',
+                description='',
+                date=now + timedelta(days=self.rng.randint(-30, 365)),
+                location='Bench',
+                tickets_available=100,
+                latitude=lat,
+                longitude=lng,
+                geohash=geo.encode(lat, lng),
+            )
+            # bulk_create() skips save(), which normally sets the state
+            event.lifecycle_state = event.get_status()
+            batch.append(event)
+            if len(batch) >= batch_size:
+                Event.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Event.objects.bulk_create(batch)
+        self.stdout.write(f'Inserted {count} events in {time.perf_counter() - started:.1f}s')
+
+    def scan(self, queryset, latitude, longitude, limit):
+        found = [
+            (geo.haversine_km(latitude, longitude, lat, lng), pk)
+            for pk, lat, lng in queryset.filter(latitude__isnull=False).values_list('pk', 'latitude', 'longitude')
+        ]
+        found.sort()
+        return found[:limit]
+
+    def timed(self, func, points):
+        timings = []
+        results = []
+        for lat, lng in points:
+            started = time.perf_counter()
+            results.append(func(lat, lng))
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings, results
+
+    def run(self, options):
+        # Same filter as the nearby endpoint
+        upcoming = Event.objects.filter(lifecycle_state__in=Event.NOT_STARTED_STATES)
+        limit = options['limit']
+        points = [self.random_point(self.cities) for _ in range(options['queries'])]
+
+        indexed, indexed_results = self.timed(
+            lambda lat, lng: geo.nearest(upcoming, lat, lng, limit), points
+        )
+        scan_points = points[:options['scan_queries']]
+        scanned, scanned_results = self.timed(
+            lambda lat, lng: self.scan(upcoming, lat, lng, limit), scan_points
+        )
+
+        matches = sum(
+            [pk for _, pk in a] == [pk for _, pk in b]
+            for a, b in zip(indexed_results, scanned_results)
+        )
+        self.stdout.write(f'Nearest {limit} upcoming events, {options["events"]} rows')
+        self.report('geohash index', indexed)
+        self.report('full scan', scanned)
+        self.stdout.write(f'Results identical to full scan: {matches}/{len(scan_points)}')
+
+        boxes = []
+        for lat, lng in points:
+            boxes.append((lat - 0.5, lng - 0.5, lat + 0.5, lng + 0.5))
+        bbox_timings = []
+        for min_lat, min_lng, max_lat, max_lng in boxes:
+            started = time.perf_counter()
+            list(upcoming.filter(
+                geo.cells_q(geo.cells_for_bbox(min_lat, min_lng, max_lat, max_lng)),
+                latitude__range=(min_lat, max_lat),
+                longitude__range=(min_lng, max_lng),
+            ).values_list('pk', flat=True)[:limit])
+            bbox_timings.append((time.perf_counter() - started) * 1000)
+        self.report('bbox (1 deg)', bbox_timings)
+
+    def report(self, label, timings):
+        if not timings:
+            return
+        timings = sorted(timings)
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(
+            f'{label:<16} median {statistics.median(timings):8.2f} ms   p95 {p95:8.2f} ms   n={len(timings)}'
+        )
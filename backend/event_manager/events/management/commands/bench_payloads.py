@@ -0,0 +1,93 @@
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.text import compress_string
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from events.models import Event, Booking
+from events.renderers import MessagePackRenderer
+from events.serializers import EventListSerializer, BookingSerializer
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class Command(BaseCommand):
+    help = 'Compare payload bytes and render CPU per page for JSON/msgpack, full/sparse, plain/gzip/br'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=200)
+        parser.add_argument('--event-fields', default='id,title,date')
+        parser.add_argument('--booking-fields', default='id,event_title,event_date,tickets_count')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        events = [
+            Event(
+                id=i,
+                title=f'Flash sale concert #{i}',
+                description='An evening of live music. ' * 20,
+                date=now + timedelta(days=i),
+                location='Millennium Hall, Addis Ababa',
+                latitude=9.0,
+                longitude=38.7,
+                tickets_available=100,
+            )
+            for i in range(1, options['page_size'] + 1)
+        ]
+        user = User(id=1, username='bench')
+        bookings = [
+            Booking(id=event.id, user=user, event=event, tickets_count=2, booked_at=now)
+            for event in events
+        ]
+
+        renderers = [('json', JSONRenderer()), ('msgpack', MessagePackRenderer())]
+        compressors = [('plain', None), ('gzip', lambda b: compress_string(b, max_random_bytes=100))]
+        if brotli is not None:
+            compressors.append(('br', lambda b: brotli.compress(b, quality=5)))
+
+        self.stdout.write(
+            f"{'payload':<22}{'format':<10}{'encoding':<10}{'bytes/page':>12}{'render us':>12}{'compress us':>13}"
+        )
+        for label, serializer_class, rows, fields in [
+            ('events full', EventListSerializer, events, None),
+            ('events sparse', EventListSerializer, events, options['event_fields']),
+            ('bookings full', BookingSerializer, bookings, None),
+            ('bookings sparse', BookingSerializer, bookings, options['booking_fields']),
+        ]:
+            path = f'/api/?fields={fields}' if fields else '/api/'
+            request = Request(APIRequestFactory().get(path))
+            for format_name, renderer in renderers:
+                body, render_us = self.render(serializer_class, rows, request, renderer, options['repeat'])
+                for encoding, compress in compressors:
+                    if compress is None:
+                        size, compress_us = len(body), 0.0
+                    else:
+                        size, compress_us = self.compress(body, compress, options['repeat'])
+                    self.stdout.write(
+                        f'{label:<22}{format_name:<10}{encoding:<10}{size:>12}{render_us:>12.0f}{compress_us:>13.0f}'
+                    )
+
+    # CPU time to serialize and render one page, in microseconds
+    def render(self, serializer_class, rows, request, renderer, repeat):
+        started = time.process_time()
+        for _ in range(repeat):
+            data = serializer_class(rows, many=True, context={'request': request}).data
+            body = renderer.render(data)
+        elapsed = time.process_time() - started
+        return body, elapsed / repeat * 1_000_000
+
+    def compress(self, body, compress, repeat):
+        started = time.process_time()
+        for _ in range(repeat):
+            content = compress(body)
+        elapsed = time.process_time() - started
+        return len(content), elapsed / repeat * 1_000_000
@@ -0,0 +1,134 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+
+from events import similarity
+from events.models import Event, SimilarEvent
+from events.views import EventViewSet
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark similar-events index build time and endpoint latency (rows are rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=20_000)
+        parser.add_argument('--users', type=int, default=50_000)
+        parser.add_argument('--bookings', type=int, default=200_000)
+        parser.add_argument('--top-k', type=int, default=20)
+        parser.add_argument('--changed', type=int, default=100,
+                            help='Events touched by new bookings before the incremental refresh')
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        now = timezone.now()
+        words = [f'word{i}' for i in range(5000)]
+        topics = [rng.sample(words, 30) for _ in range(200)]
+
+        events = []
+        for i in range(1, options['events'] + 1):
+            topic = rng.choice(topics)
+            events.append((
+                i,
+                ' '.join(rng.sample(topic, 4)),
+                ' '.join(rng.choices(topic, k=40) + rng.choices(words, k=20)),
+                now + timedelta(days=rng.randint(-60, 300)),
+            ))
+        bookings = {
+            (rng.randrange(options['users']), rng.randint(1, options['events']))
+            for _ in range(options['bookings'])
+        }
+
+        started = time.perf_counter()
+        neighbours = similarity.compute_neighbours(events, list(bookings), options['top_k'], now=now)
+        build_seconds = time.perf_counter() - started
+        self.stdout.write(
+            f'Index build: {len(events)} events, {len(bookings)} bookings, top-{options["top_k"]} '
+            f'in {build_seconds:.2f}s ({build_seconds / len(events) * 1e6:.0f} us/event)'
+        )
+        self.measure_refresh(events, bookings, neighbours, rng, options, now, build_seconds)
+
+        try:
+            with transaction.atomic():
+                self.measure_endpoint(events, neighbours, rng, options['requests'])
+                raise Rollback()
+        except Rollback:
+            pass
+
+    # New bookings on a few events, then re-score only those against a full rebuild
+    def measure_refresh(self, events, bookings, neighbours, rng, options, now, build_seconds):
+        changed = rng.sample(range(1, options['events'] + 1), options['changed'])
+        bookings = list(bookings) + [
+            (rng.randrange(options['users']), event_id) for event_id in changed for _ in range(5)
+        ]
+
+        started = time.perf_counter()
+        refreshed = similarity.refresh_neighbours(
+            events, bookings, neighbours, changed, options['top_k'], now=now
+        )
+        refresh_seconds = time.perf_counter() - started
+        expected = similarity.compute_neighbours(events, bookings, options['top_k'], now=now)
+        merged = {**neighbours, **refreshed}
+        # Scores only: events with equal scores may come back in either order
+        matching = sum(
+            [score for _, score in similarity.rounded(merged.get(event_id, []))]
+            == [score for _, score in similarity.rounded(items)]
+            for event_id, items in expected.items()
+        )
+        self.stdout.write(
+            f'Incremental refresh: {options["changed"]} events with new bookings in '
+            f'{refresh_seconds:.2f}s ({build_seconds:.2f}s full), {len(refreshed)} lists changed; '
+            f'{matching}/{len(expected)} lists match a full rebuild'
+        )
+
+    def measure_endpoint(self, events, neighbours, rng, requests):
+        id_map = {}
+        for start in range(0, len(events), 5000):
+            batch = [
+                Event(title=title, description=description, date=date,
+                      location='Bench', tickets_available=100)
+                for _, title, description, date in events[start:start + 5000]
+            ]
+            # bulk_create() skips save(), which normally sets the state
+            for event in batch:
+                event.lifecycle_state = event.get_status()
+            created = Event.objects.bulk_create(batch)
+            for (old_id, *_), event in zip(events[start:start + 5000], created):
+                id_map[old_id] = event.pk
+        SimilarEvent.objects.bulk_create(
+            [
+                SimilarEvent(event_id=id_map[event_id], similar_id=id_map[similar_id], rank=rank, score=score)
+                for event_id, items in neighbours.items()
+                for rank, (similar_id, score) in enumerate(items)
+            ],
+            batch_size=5000,
+        )
+
+        view = EventViewSet.as_view({'get': 'similar'})
+        factory = APIRequestFactory()
+        pks = list(id_map.values())
+        timings = []
+        for _ in range(requests):
+            pk = rng.choice(pks)
+            request = factory.get(f'/api/events/{pk}/similar/', HTTP_HOST='localhost')
+            started = time.perf_counter()
+            response = view(request, pk=pk)
+            response.render()
+            timings.append((time.perf_counter() - started) * 1000)
+
+        timings.sort()
+        self.stdout.write(
+            f'GET /api/events/{{id}}/similar/: median {statistics.median(timings):.2f} ms, '
+            f'p95 {timings[int(len(timings) * 0.95) - 1]:.2f} ms over {requests} requests'
+        )
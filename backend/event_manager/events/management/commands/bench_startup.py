@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from event_manager import startup
+
+
+class Command(BaseCommand):
+    help = 'Measure cold-start import time and time to first response per settings profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=10)
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'profile':<8}{'import ms':>12}{'first resp ms':>16}{'process ms':>13}{'modules':>10}"
+        )
+        for name, result in startup.compare_profiles(runs=options['runs']).items():
+            self.stdout.write(
+                f"{name:<8}"
+                f"{result['import_seconds'] * 1000:>12.1f}"
+                f"{result['first_response_seconds'] * 1000:>16.1f}"
+                f"{result['process_seconds'] * 1000:>13.1f}"
+                f"{result['module_count']:>10}"
+            )
@@ -0,0 +1,93 @@
+import random
+import time
+from types import SimpleNamespace
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+from rest_framework.throttling import ScopedRateThrottle
+
+from events.throttling import MemoryTokenBucketStore, CacheTokenBucketStore, parse_rate
+
+
+class Command(BaseCommand):
+    help = 'Benchmark token-bucket throttle checks and DB load under a simulated bot flood'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checks', type=int, default=200_000)
+        parser.add_argument('--clients', type=int, default=10_000)
+        parser.add_argument('--rate', default='10/min')
+        parser.add_argument('--bots', type=int, default=200)
+        parser.add_argument('--bot-rps', type=float, default=20.0, help='Requests per second per bot')
+        parser.add_argument('--users', type=int, default=2_000)
+        parser.add_argument('--user-rpm', type=float, default=2.0, help='Requests per minute per real user')
+        parser.add_argument('--seconds', type=int, default=300)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rate, capacity = parse_rate(options['rate'])
+        self.overhead(options, rate, capacity)
+        self.flood(options, rate, capacity)
+
+    def overhead(self, options, rate, capacity):
+        rng = random.Random(options['seed'])
+        keys = [f'booking:user:{rng.randrange(options["clients"])}' for _ in range(options['checks'])]
+
+        self.stdout.write(f'Throttle check overhead ({options["checks"]} checks, {options["clients"]} clients)')
+        for label, store in [
+            ('token bucket, memory', MemoryTokenBucketStore()),
+            ('token bucket, locmem cache', CacheTokenBucketStore(LocMemCache('bench-throttle', {}))),
+        ]:
+            started = time.perf_counter()
+            for key in keys:
+                store.consume(key, rate, capacity)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'  {label:<28}{elapsed / len(keys) * 1e6:8.2f} us/check')
+
+        # DRF's built-in scoped throttle keeps a timestamp list per client
+        throttle = ScopedRateThrottle()
+        throttle.cache = LocMemCache('bench-throttle-drf', {})
+        throttle.THROTTLE_RATES = {'bench': options['rate']}
+        view = SimpleNamespace(throttle_scope='bench')
+        requests = [
+            SimpleNamespace(user=SimpleNamespace(is_authenticated=True, pk=key), META={})
+            for key in keys
+        ]
+        started = time.perf_counter()
+        for request in requests:
+            throttle.allow_request(request, view)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'  {"DRF ScopedRateThrottle":<28}{elapsed / len(keys) * 1e6:8.2f} us/check')
+
+    # Simulated clock: every request that passes the throttle costs a DB transaction
+    def flood(self, options, rate, capacity):
+        rng = random.Random(options['seed'])
+        events = []
+        for bot in range(options['bots']):
+            t = rng.random()
+            while t < options['seconds']:
+                events.append((t, f'bot:{bot}', True))
+                t += rng.expovariate(options['bot_rps'])
+        for user in range(options['users']):
+            t = rng.expovariate(options['user_rpm'] / 60)
+            while t < options['seconds']:
+                events.append((t, f'user:{user}', False))
+                t += rng.expovariate(options['user_rpm'] / 60)
+        events.sort()
+
+        store = MemoryTokenBucketStore()
+        passed = {True: 0, False: 0}
+        total = {True: 0, False: 0}
+        for t, client, is_bot in events:
+            total[is_bot] += 1
+            allowed, _ = store.consume(f'booking:{client}', rate, capacity, now=t)
+            passed[is_bot] += allowed
+
+        before = total[True] + total[False]
+        after = passed[True] + passed[False]
+        self.stdout.write(f'Bot flood over {options["seconds"]}s at {options["rate"]}')
+        self.stdout.write(f'  bot requests        {total[True]:>10}  reaching DB {passed[True]:>10}')
+        self.stdout.write(f'  real user requests  {total[False]:>10}  reaching DB {passed[False]:>10}')
+        self.stdout.write(self.style.SUCCESS(
+            f'  DB transactions {before} -> {after} ({100.0 * (before - after) / before:.1f}% fewer); '
+            f'{100.0 * passed[False] / max(total[False], 1):.1f}% of real user requests served'
+        ))
@@ -0,0 +1,42 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from events import similarity
+from events.models import SimilarityBuild
+
+
+class Command(BaseCommand):
+    help = 'Refresh the precomputed similar-events index (run from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=20)
+        parser.add_argument('--text-weight', type=float, default=0.7,
+                            help='Weight of text similarity vs co-booking (0..1)')
+        parser.add_argument('--full', action='store_true',
+                            help='Re-score every event instead of only what changed since the last build')
+        parser.add_argument('--if-stale', action='store_true',
+                            help='Skip the build when no event or booking changed since the last one')
+        parser.add_argument('--max-age-hours', type=float, default=24,
+                            help='Run a full build once the last one is this old')
+
+    def handle(self, *args, **options):
+        max_age = timedelta(hours=options['max_age_hours'])
+        if options['if_stale'] and not similarity.is_stale(max_age):
+            self.stdout.write('Similar-events index is up to date')
+            return
+
+        # Incremental refreshes leave deletions and IDF drift behind, so a
+        # full build still runs every max_age
+        last_full = SimilarityBuild.objects.filter(full=True).order_by('-started_at').first()
+        full = options['full'] or last_full is None or timezone.now() - last_full.started_at > max_age
+
+        build = similarity.build_index if full else similarity.refresh_index
+        started = time.perf_counter()
+        build = build(k=options['top_k'], text_weight=options['text_weight'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Indexed" if full else "Refreshed"} {build.events_count} events in '
+            f'{time.perf_counter() - started:.1f}s; {build.events_updated} neighbour lists updated'
+        ))
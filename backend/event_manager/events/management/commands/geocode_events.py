@@ -0,0 +1,101 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from events import geo
+from events.models import Event
+
+
+def normalize(name):
+    return ' '.join(name.lower().split())
+
+
+def load_gazetteer(path, file_format):
+    """Map normalized place name -> (latitude, longitude).
+
+    csv:      header row with name, latitude, longitude columns
+    geonames: GeoNames dump (e.g. cities15000.txt); on duplicate names the
+              most populous place wins
+    """
+    places = {}
+    try:
+        with open(path, newline='', encoding='utf-8') as f:
+            if file_format == 'geonames':
+                population = {}
+                for row in csv.reader(f, delimiter='\t', quoting=csv.QUOTE_NONE):
+                    if len(row) < 15:
+                        continue
+                    coords = (float(row[4]), float(row[5]))
+                    size = int(row[14] or 0)
+                    for name in {row[1], row[2]}:
+                        key = normalize(name)
+                        if key and size >= population.get(key, -1):
+                            places[key] = coords
+                            population[key] = size
+            else:
+                for row in csv.DictReader(f):
+                    key = normalize(row['name'])
+                    if key and key not in places:
+                        places[key] = (float(row['latitude']), float(row['longitude']))
+    except (OSError, KeyError, ValueError) as e:
+        raise CommandError(f'Could not read gazetteer {path}: {e}')
+    return places
+
+
+# Try the full location first, then each comma separated part
+# ("Millennium Hall, Addis Ababa, Ethiopia" -> "addis ababa")
+def lookup(places, location):
+    key = normalize(location)
+    if key in places:
+        return places[key]
+    for part in location.split(','):
+        key = normalize(part)
+        if key in places:
+            return places[key]
+    return None
+
+
+class Command(BaseCommand):
+    help = 'Bulk geocode events from a local gazetteer file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('gazetteer', help='Path to the gazetteer file')
+        parser.add_argument('--format', choices=['csv', 'geonames'], default='csv')
+        parser.add_argument('--all', action='store_true', help='Re-geocode events that already have coordinates')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        places = load_gazetteer(options['gazetteer'], options['format'])
+        self.stdout.write(f'Loaded {len(places)} places')
+
+        events = Event.objects.only('id', 'location', 'latitude', 'longitude', 'geohash')
+        if not options['all']:
+            events = events.filter(latitude__isnull=True)
+
+        cache = {}
+        batch = []
+        updated = 0
+        missed = 0
+        for event in events.iterator(chunk_size=options['batch_size']):
+            if event.location not in cache:
+                cache[event.location] = lookup(places, event.location)
+            coords = cache[event.location]
+            if coords is None:
+                missed += 1
+                continue
+
+            event.latitude, event.longitude = coords
+            event.geohash = geo.encode(*coords)
+            batch.append(event)
+            if len(batch) >= options['batch_size']:
+                Event.objects.bulk_update(batch, ['latitude', 'longitude', 'geohash'])
+                updated += len(batch)
+                batch = []
+
+        if batch:
+            Event.objects.bulk_update(batch, ['latitude', 'longitude', 'geohash'])
+            updated += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Geocoded {updated} events; {missed} locations not found'
+        ))
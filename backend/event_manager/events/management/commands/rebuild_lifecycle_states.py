@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from events import lifecycle
+
+
+class Command(BaseCommand):
+    help = 'Recompute every stored event lifecycle state and verify it against Event.get_status()'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify-only', action='store_true', help='Only report mismatches')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not options['verify_only']:
+            moved = lifecycle.rebuild(batch_size=options['batch_size'])
+            self.stdout.write(
+                'Rebuilt lifecycle states: '
+                + ', '.join(f'{count} to {state}' for state, count in moved.items())
+            )
+
+        mismatches = 0
+        for event, stored, live in lifecycle.verify():
+            mismatches += 1
+            if mismatches <= 20:
+                self.stdout.write(f'  event {event.pk} "{event.title}": stored {stored}, expected {live}')
+
+        if mismatches:
+            # A state can legitimately flip between rebuild and verify at a boundary
+            raise CommandError(f'{mismatches} events have a stale lifecycle state')
+        self.stdout.write(self.style.SUCCESS('All lifecycle states match Event.get_status()'))
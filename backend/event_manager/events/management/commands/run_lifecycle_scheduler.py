@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from events import lifecycle
+
+
+class Command(BaseCommand):
+    help = 'Advance stored event lifecycle states as events start and days roll over'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Apply due transitions and exit (for cron)')
+        parser.add_argument('--max-sleep', type=float, default=60.0,
+                            help='Upper bound between runs, so new or edited events are picked up')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                close_old_connections()
+                now = timezone.now()
+                moved = lifecycle.advance(now, batch_size=options['batch_size'])
+                if any(moved.values()):
+                    self.stdout.write(
+                        f'{now:%Y-%m-%d %H:%M:%S} moved '
+                        + ', '.join(f'{count} to {state}' for state, count in moved.items() if count)
+                    )
+                if options['once']:
+                    return
+
+                wait = (lifecycle.next_transition(now) - timezone.now()).total_seconds()
+                time.sleep(min(max(wait, 0.0), options['max_sleep']))
+        except KeyboardInterrupt:
+            pass
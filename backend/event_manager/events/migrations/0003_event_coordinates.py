@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0002_alter_event_image_alter_event_thumbnail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=9, null=True),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0003_event_coordinates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarityBuild',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField(auto_now_add=True)),
+                ('events_count', models.IntegerField()),
+                ('bookings_count', models.IntegerField()),
+                ('events_updated', models.IntegerField()),
+            ],
+            options={
+                'ordering': ['-started_at'],
+                'get_latest_by': 'started_at',
+            },
+        ),
+        migrations.CreateModel(
+            name='SimilarEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_events', to='events.event')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='events.event')),
+            ],
+            options={
+                'ordering': ['event', 'rank'],
+                'unique_together': {('event', 'rank')},
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:33
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_lifecycle_state(apps, schema_editor):
+    Event = apps.get_model('events', 'Event')
+    now = timezone.now()
+    tomorrow = now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    Event.objects.filter(date__isnull=True).update(lifecycle_state='unscheduled')
+    Event.objects.filter(date__lt=now).update(lifecycle_state='past')
+    Event.objects.filter(date__gte=now, date__lt=tomorrow).update(lifecycle_state='today')
+    Event.objects.filter(date__gte=tomorrow).update(lifecycle_state='upcoming')
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0004_similar_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='lifecycle_state',
+            field=models.CharField(choices=[('unscheduled', 'Unscheduled'), ('past', 'Past'), ('today', 'Today'), ('upcoming', 'Upcoming')], default='upcoming', editable=False, max_length=11),
+        ),
+        migrations.RunPython(backfill_lifecycle_state, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['lifecycle_state', 'date'], name='event_lifecycle_date_idx'),
+        ),
+    ]
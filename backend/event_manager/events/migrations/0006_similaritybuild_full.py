@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0005_event_lifecycle_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='similaritybuild',
+            name='full',
+            field=models.BooleanField(default=True),
+        ),
+    ]
@@ -2,12 +2,44 @@ from django.db import models
 from django.core.validators import MinValueValidator
 from django.contrib.auth.models import User
 from django.utils import timezone
+from . import geo
 
 class Event(models.Model):
+    UNSCHEDULED = 'unscheduled'
+    PAST = 'past'
+    TODAY = 'today'
+    UPCOMING = 'upcoming'
+    LIFECYCLE_CHOICES = [
+        (UNSCHEDULED, 'Unscheduled'),
+        (PAST, 'Past'),
+        (TODAY, 'Today'),
+        (UPCOMING, 'Upcoming'),
+    ]
+    # States whose events haven't started yet (matches date >= now)
+    NOT_STARTED_STATES = [TODAY, UPCOMING]
+
     title = models.CharField(max_length=200)
     description = models.TextField()
     date = models.DateTimeField()
+    # Stored get_status(); set in save() and advanced by the lifecycle
+    # scheduler (events/lifecycle.py) as events start and days roll over
+    lifecycle_state = models.CharField(
+        max_length=11,
+        choices=LIFECYCLE_CHOICES,
+        default=UPCOMING,
+        editable=False
+    )
     location = models.CharField(max_length=200)
+    latitude = models.FloatField(blank=True, null=True)
+    longitude = models.FloatField(blank=True, null=True)
+    # Derived from latitude/longitude in save(); indexed for nearby queries
+    geohash = models.CharField(
+        max_length=geo.GEOHASH_PRECISION,
+        blank=True,
+        null=True,
+        editable=False,
+        db_index=True
+    )
     tickets_available = models.IntegerField(validators=[MinValueValidator(0)])
     thumbnail = models.ImageField(
         upload_to='event_thumbnails/',
@@ -25,6 +57,24 @@ class Event(models.Model):
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        self.geohash = self.compute_geohash()
+        self.lifecycle_state = self.get_status()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if {'latitude', 'longitude'} & update_fields:
+                update_fields.add('geohash')
+            if 'date' in update_fields:
+                update_fields.add('lifecycle_state')
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+
+    def compute_geohash(self):
+        if self.latitude is None or self.longitude is None:
+            return None
+        return geo.encode(self.latitude, self.longitude)
+
     def get_thumbnail_url(self):
         if self.thumbnail:
             return self.thumbnail.url
@@ -53,7 +103,7 @@ class Event(models.Model):
             return False
         return self.date.date() == timezone.now().date()
 
-    # Get event status
+    # Get event status from the live clock (lifecycle_state stores this)
     def get_status(self):
         if not self.date:  # Handle None date
             return 'unscheduled'
@@ -66,12 +116,13 @@ class Event(models.Model):
 
     # Check if booking is allowed (not past and tickets available)
     def can_book(self):
-        if not self.date:  # Handle None date
-            return self.tickets_available > 0
-        return self.is_upcoming() and self.tickets_available > 0
+        return self.lifecycle_state != self.PAST and self.tickets_available > 0
 
     class Meta:
         ordering = ['date']
+        indexes = [
+            models.Index(fields=['lifecycle_state', 'date'], name='event_lifecycle_date_idx'),
+        ]
 
 class Booking(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -84,4 +135,36 @@ class Booking(models.Model):
         ordering = ['-booked_at']
 
     def __str__(self):
-        return f"{self.user.username} - {self.event.title} ({self.tickets_count})"
\ No newline at end of file
+        return f"{self.user.username} - {self.event.title} ({self.tickets_count})"
+
+# Precomputed "similar events" neighbours, written by build_similar_events
+class SimilarEvent(models.Model):
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='similar_events')
+    similar = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        # Also the index behind GET /api/events/{id}/similar/
+        unique_together = ['event', 'rank']
+        ordering = ['event', 'rank']
+
+    def __str__(self):
+        return f"{self.event_id} -> {self.similar_id} ({self.score:.3f})"
+
+class SimilarityBuild(models.Model):
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(auto_now_add=True)
+    events_count = models.IntegerField()
+    bookings_count = models.IntegerField()
+    events_updated = models.IntegerField()
+    # False for refreshes that only re-scored what changed since the last build
+    full = models.BooleanField(default=True)
+
+    class Meta:
+        ordering = ['-started_at']
+        get_latest_by = 'started_at'
+
+    def __str__(self):
+        kind = 'build' if self.full else 'refresh'
+        return f"Similarity {kind} {self.started_at:%Y-%m-%d %H:%M} ({self.events_updated} updated)"
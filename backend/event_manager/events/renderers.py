@@ -0,0 +1,32 @@
+import datetime
+import decimal
+import uuid
+
+from rest_framework.renderers import BaseRenderer
+
+
+def encode_default(obj):
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, (decimal.Decimal, uuid.UUID)):
+        return str(obj)
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    raise TypeError(f'Cannot serialize {type(obj).__name__} to msgpack')
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Compact binary responses, negotiated with Accept: application/msgpack."""
+
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Imported here so workers that never negotiate msgpack don't load it
+        import msgpack
+
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=encode_default, use_bin_type=True)
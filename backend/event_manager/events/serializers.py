@@ -3,6 +3,55 @@ from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
 from .models import Event, Booking
 
+class SparseFieldsMixin:
+    """Limit GET output to ?fields=id,title,... and trim the DB select list to match."""
+
+    # Model fields read by each serializer field that isn't a plain model field
+    field_sources = {}
+    # Model fields always loaded, whatever was requested
+    required_sources = ['id']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = self.requested_fields(self.context.get('request'), self.fields)
+        if requested:
+            for name in set(self.fields) - requested:
+                self.fields.pop(name)
+
+    @staticmethod
+    def requested_fields(request, available):
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return None
+        param = request.query_params.get('fields')
+        if not param:
+            return None
+        requested = {name.strip() for name in param.split(',')} & set(available)
+        return requested or None
+
+    @classmethod
+    def sparse_queryset(cls, queryset, request):
+        requested = cls.requested_fields(request, cls().fields)
+        if not requested:
+            return queryset
+        columns = set(cls.required_sources)
+        for name in requested:
+            columns.update(cls.field_sources.get(name, [name]))
+        return queryset.only(*columns)
+
+
+# Model fields behind the computed fields of EventSerializer and
+# EventListSerializer (each only looks up the fields it has)
+EVENT_FIELD_SOURCES = {
+    'thumbnail_url': ['thumbnail'],
+    'image_url': ['image'],
+    'is_past': ['lifecycle_state'],
+    'is_upcoming': ['lifecycle_state'],
+    'status': ['lifecycle_state'],
+    'can_book': ['lifecycle_state', 'tickets_available'],
+    'distance_km': [],
+}
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -26,7 +75,7 @@ class UserRegisterSerializer(serializers.ModelSerializer):
         user = User.objects.create_user(**validated_data)
         return user
 
-class EventSerializer(serializers.ModelSerializer):
+class EventSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     thumbnail_url = serializers.SerializerMethodField()
     image_url = serializers.SerializerMethodField()
     is_past = serializers.SerializerMethodField()
@@ -34,6 +83,8 @@ class EventSerializer(serializers.ModelSerializer):
     status = serializers.SerializerMethodField()
     can_book = serializers.SerializerMethodField()
 
+    field_sources = EVENT_FIELD_SOURCES
+
     class Meta:
         model = Event
         fields = '__all__'
@@ -55,27 +106,30 @@ class EventSerializer(serializers.ModelSerializer):
         return None
 
     def get_is_past(self, obj):
-        return obj.is_past()
+        return obj.lifecycle_state == Event.PAST
 
     def get_is_upcoming(self, obj):
-        return obj.is_upcoming()
+        return obj.lifecycle_state != Event.PAST
 
     def get_status(self, obj):
-        return obj.get_status()
+        return obj.lifecycle_state
 
     def get_can_book(self, obj):
         return obj.can_book()
 
-class EventListSerializer(serializers.ModelSerializer):
+class EventListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     thumbnail_url = serializers.SerializerMethodField()
     is_past = serializers.SerializerMethodField()
     is_upcoming = serializers.SerializerMethodField()
     status = serializers.SerializerMethodField()
     can_book = serializers.SerializerMethodField()
+    distance_km = serializers.SerializerMethodField()
+
+    field_sources = EVENT_FIELD_SOURCES
 
     class Meta:
         model = Event
-        fields = ['id', 'title', 'date', 'location', 'thumbnail_url', 'tickets_available', 'is_past', 'is_upcoming', 'status', 'can_book']
+        fields = ['id', 'title', 'date', 'location', 'latitude', 'longitude', 'distance_km', 'thumbnail_url', 'tickets_available', 'is_past', 'is_upcoming', 'status', 'can_book']
 
     def get_thumbnail_url(self, obj):
         if obj.thumbnail:
@@ -86,28 +140,45 @@ class EventListSerializer(serializers.ModelSerializer):
         return None
 
     def get_is_past(self, obj):
-        return obj.is_past()
+        return obj.lifecycle_state == Event.PAST
 
     def get_is_upcoming(self, obj):
-        return obj.is_upcoming()
+        return obj.lifecycle_state != Event.PAST
 
     def get_status(self, obj):
-        return obj.get_status()
+        return obj.lifecycle_state
 
     def get_can_book(self, obj):
         return obj.can_book()
 
-class BookingSerializer(serializers.ModelSerializer):
+    # Only set by the nearby action
+    def get_distance_km(self, obj):
+        return getattr(obj, 'distance_km', None)
+
+class BookingSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     event_title = serializers.CharField(source='event.title', read_only=True)
     event_date = serializers.DateTimeField(source='event.date', read_only=True)
     event_location = serializers.CharField(source='event.location', read_only=True)
     event_image = serializers.SerializerMethodField()
-    event_is_past = serializers.BooleanField(source='event.is_past', read_only=True)
+    event_is_past = serializers.SerializerMethodField()
+
+    field_sources = {
+        'event_title': ['event', 'event__title'],
+        'event_date': ['event', 'event__date'],
+        'event_location': ['event', 'event__location'],
+        'event_image': ['event', 'event__thumbnail'],
+        'event_is_past': ['event', 'event__lifecycle_state'],
+    }
+    # The event FK has to stay loaded because get_queryset uses select_related
+    required_sources = ['id', 'event']
 
     class Meta:
         model = Booking
         fields = ['id', 'event', 'event_title', 'event_date', 'event_location', 'event_image', 'event_is_past', 'booked_at', 'tickets_count']
 
+    def get_event_is_past(self, obj):
+        return obj.event.lifecycle_state == Event.PAST
+
     def get_event_image(self, obj):
         if obj.event.thumbnail:
             request = self.context.get('request')
@@ -0,0 +1,16 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .admission import get_controller
+from .models import Event
+
+
+# Keep the admission sold-out marker and in-flight limit in step with
+# tickets_available, whichever path (booking, cancellation, admin) saved it
+@receiver(post_save, sender=Event)
+def sync_event_admission(sender, instance, **kwargs):
+    get_controller().sync(instance)
+
+
+@receiver(post_delete, sender=Event)
+def clear_event_admission(sender, instance, **kwargs):
+    get_controller().clear(instance.pk)
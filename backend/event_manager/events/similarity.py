@@ -0,0 +1,283 @@
+"""
+Offline "similar events" index.
+
+Scores every event against every upcoming event by a blend of TF-IDF
+cosine similarity on title/description and co-booking cosine similarity
+(users who booked one also booked the other), keeps the top-k per event
+and stores them in SimilarEvent. Only used by the build_similar_events
+command, so NumPy/SciPy are never imported by web workers.
+
+build_index() scores everything. refresh_index() only re-scores what
+changed since the last build: events created or edited since then and
+events with new bookings get their own lists recomputed, and are scored
+as candidates for every other event's list. Vectors are still built from
+all events and bookings, which is linear and cheap next to the
+N x upcoming scoring. Deletions, cancellations, candidates that have since
+started and IDF drift are left to the next full build.
+"""
+import re
+from datetime import timedelta
+
+import numpy as np
+from scipy import sparse
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Event, Booking, SimilarEvent, SimilarityBuild
+
+TOKEN_RE = re.compile(r'[a-z0-9]{2,}')
+STOP_WORDS = frozenset(
+    'a an and are as at be by for from has in is it of on or that the this to was '
+    'were will with you your our we us'.split()
+)
+
+# Scores compared when deciding whether an event's neighbours changed
+SCORE_DECIMALS = 4
+# Dense score cells per block (block rows x targets), ~40MB of float64
+BLOCK_CELLS = 5_000_000
+
+
+def tfidf_matrix(documents):
+    """L2-normalised sublinear TF-IDF rows, one per document (CSR)."""
+    vocabulary = {}
+    rows = []
+    cols = []
+    for row, text in enumerate(documents):
+        tokens = [t for t in TOKEN_RE.findall(text.lower()) if t not in STOP_WORDS]
+        cols.extend(vocabulary.setdefault(t, len(vocabulary)) for t in tokens)
+        rows.extend([row] * len(tokens))
+
+    shape = (len(documents), max(len(vocabulary), 1))
+    counts = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float64), (rows, cols)), shape=shape
+    )
+    counts.sum_duplicates()
+
+    counts.data = 1.0 + np.log(counts.data)
+    df = np.bincount(counts.indices, minlength=shape[1])
+    idf = np.log((1.0 + shape[0]) / (1.0 + df)) + 1.0
+    matrix = counts @ sparse.diags(idf)
+    return normalize_rows(matrix)
+
+
+def normalize_rows(matrix):
+    matrix = sparse.csr_matrix(matrix)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.diags(1.0 / norms) @ matrix
+
+
+def cobooking_matrix(bookings, n_events):
+    """Binary events x users matrix (CSR), rows L2-normalised."""
+    if not bookings:
+        return sparse.csr_matrix((n_events, 1))
+    events, users = zip(*bookings)
+    _, user_index = np.unique(np.asarray(users), return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(events)), (np.asarray(events), user_index)),
+        shape=(n_events, int(user_index.max()) + 1),
+    )
+    matrix.data[:] = 1.0  # duplicate (user, event) rows count once
+    return normalize_rows(matrix)
+
+
+def top_k(text, cobook, targets, k, text_weight=0.7, rows=None):
+    """
+    Yield (row, [(target_row, score), ...]) for each of rows (default: every
+    row of the matrices), best first. text/cobook are row-normalised (n x d)
+    matrices, so a row product is a cosine similarity; targets are the
+    candidate row indices.
+    """
+    n = text.shape[0]
+    rows = np.arange(n) if rows is None else np.asarray(rows, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    if len(rows) == 0 or len(targets) == 0:
+        return
+
+    # CSR on both sides, otherwise scipy converts on every block product
+    text_targets = text[targets].T.tocsr()
+    cobook_targets = cobook[targets].T.tocsr()
+    target_column = np.full(n, -1, dtype=np.int64)
+    target_column[targets] = np.arange(len(targets))
+    keep = min(k, len(targets))
+
+    block_size = max(1, BLOCK_CELLS // len(targets))
+    for start in range(0, len(rows), block_size):
+        block = rows[start:start + block_size]
+        scores = text_weight * (text[block] @ text_targets).toarray()
+        scores += (1.0 - text_weight) * (cobook[block] @ cobook_targets).toarray()
+
+        # An event is never similar to itself
+        own = target_column[block]
+        has_own = own >= 0
+        scores[np.nonzero(has_own)[0], own[has_own]] = -np.inf
+
+        if keep < len(targets):
+            best = np.argpartition(-scores, keep - 1, axis=1)[:, :keep]
+        else:
+            best = np.tile(np.arange(len(targets)), (len(block), 1))
+        best_scores = np.take_along_axis(scores, best, axis=1)
+        order = np.argsort(-best_scores, axis=1)
+        best = np.take_along_axis(best, order, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+
+        for i, row in enumerate(block):
+            yield row, [
+                (int(targets[col]), float(score))
+                for col, score in zip(best[i], best_scores[i])
+                if score > 0
+            ]
+
+
+def build_matrices(events, bookings):
+    """Row index per event id plus the text and co-booking matrices."""
+    index = {event[0]: row for row, event in enumerate(events)}
+    text = tfidf_matrix([f'{title} {title} {description}' for _, title, description, _ in events])
+    cobook = cobooking_matrix(
+        [(index[event_id], user_id) for user_id, event_id in bookings if event_id in index],
+        len(events),
+    )
+    return index, text, cobook
+
+
+def upcoming_rows(events, now):
+    return [row for row, event in enumerate(events) if event[3] is None or event[3] >= now]
+
+
+def compute_neighbours(events, bookings, k, text_weight=0.7, now=None):
+    """
+    events: [(id, title, description, date)], bookings: [(user_id, event_id)].
+    Returns {event_id: [(similar_event_id, score), ...]}.
+    """
+    now = now or timezone.now()
+    ids = [event[0] for event in events]
+    _, text, cobook = build_matrices(events, bookings)
+
+    return {
+        ids[row]: [(ids[target], score) for target, score in neighbours]
+        for row, neighbours in top_k(text, cobook, upcoming_rows(events, now), k, text_weight)
+    }
+
+
+def refresh_neighbours(events, bookings, stored, changed_ids, k, text_weight=0.7, now=None):
+    """
+    Neighbour lists affected by changes to changed_ids, given the stored
+    lists ({event_id: [(similar_id, score), ...]}). Returns only the lists
+    that were recomputed or merged.
+    """
+    now = now or timezone.now()
+    ids = [event[0] for event in events]
+    index, text, cobook = build_matrices(events, bookings)
+    changed_ids = set(changed_ids) & set(index)
+
+    # Lists holding a changed event may lose it from their top k, so they
+    # are recomputed in full along with the changed events' own lists
+    rescore = changed_ids | {
+        event_id for event_id, items in stored.items()
+        if event_id in index and any(similar_id in changed_ids for similar_id, _ in items)
+    }
+    targets = upcoming_rows(events, now)
+    neighbours = {
+        ids[row]: [(ids[target], score) for target, score in items]
+        for row, items in top_k(
+            text, cobook, targets, k, text_weight, rows=sorted(index[event_id] for event_id in rescore)
+        )
+    }
+
+    # Every other list keeps its entries and may gain changed upcoming events
+    changed_rows = {index[event_id] for event_id in changed_ids}
+    changed_targets = [row for row in targets if row in changed_rows]
+    others = [row for row, event_id in enumerate(ids) if event_id not in rescore]
+    for row, items in top_k(text, cobook, changed_targets, k, text_weight, rows=others):
+        current = stored.get(ids[row], [])
+        floor = current[-1][1] if len(current) >= k else 0.0
+        gained = [(ids[target], score) for target, score in items if score > floor]
+        if gained:
+            neighbours[ids[row]] = sorted(current + gained, key=lambda item: -item[1])[:k]
+    return neighbours
+
+
+def is_stale(max_age=timedelta(days=1)):
+    """Whether anything changed since the last build, or the last full build is older than max_age."""
+    try:
+        last = SimilarityBuild.objects.latest()
+        last_full = SimilarityBuild.objects.filter(full=True).latest()
+    except SimilarityBuild.DoesNotExist:
+        return True
+    return (
+        timezone.now() - last_full.started_at > max_age
+        or Event.objects.filter(updated_at__gte=last.started_at).exists()
+        or Booking.objects.filter(booked_at__gte=last.started_at).exists()
+        # Deletions leave no timestamp behind
+        or Event.objects.count() != last.events_count
+        or Booking.objects.count() != last.bookings_count
+    )
+
+
+def stored_neighbours():
+    stored = {}
+    for event_id, similar_id, score in SimilarEvent.objects.order_by('event', 'rank').values_list(
+        'event_id', 'similar_id', 'score'
+    ):
+        stored.setdefault(event_id, []).append((similar_id, score))
+    return stored
+
+
+def rounded(items):
+    return [(similar_id, round(score, SCORE_DECIMALS)) for similar_id, score in items]
+
+
+# Rewrite the lists in neighbours that differ from stored; record the build
+def save_neighbours(neighbours, stored, started_at, events_count, bookings_count, full):
+    changed = [
+        event_id for event_id, items in neighbours.items()
+        if rounded(stored.get(event_id, [])) != rounded(items)
+    ]
+
+    with transaction.atomic():
+        for start in range(0, len(changed), 5000):
+            SimilarEvent.objects.filter(event_id__in=changed[start:start + 5000]).delete()
+        SimilarEvent.objects.bulk_create(
+            [
+                SimilarEvent(event_id=event_id, similar_id=similar_id, rank=rank, score=score)
+                for event_id in changed
+                for rank, (similar_id, score) in enumerate(neighbours[event_id])
+            ],
+            batch_size=5000,
+        )
+        return SimilarityBuild.objects.create(
+            started_at=started_at,
+            events_count=events_count,
+            bookings_count=bookings_count,
+            events_updated=len(changed),
+            full=full,
+        )
+
+
+def build_index(k=20, text_weight=0.7):
+    """Recompute all neighbours and rewrite only the events whose list changed."""
+    started_at = timezone.now()
+    events = list(Event.objects.order_by().values_list('id', 'title', 'description', 'date'))
+    bookings = list(Booking.objects.order_by().values_list('user_id', 'event_id'))
+    neighbours = compute_neighbours(events, bookings, k, text_weight, now=started_at)
+    return save_neighbours(neighbours, stored_neighbours(), started_at, len(events), len(bookings), full=True)
+
+
+def refresh_index(k=20, text_weight=0.7):
+    """Re-score what changed since the last build (a full build when there is none)."""
+    try:
+        last = SimilarityBuild.objects.latest()
+    except SimilarityBuild.DoesNotExist:
+        return build_index(k, text_weight)
+
+    started_at = timezone.now()
+    changed_ids = set(
+        Event.objects.filter(updated_at__gte=last.started_at).values_list('id', flat=True)
+    ) | set(
+        Booking.objects.filter(booked_at__gte=last.started_at).values_list('event_id', flat=True)
+    )
+    events = list(Event.objects.order_by().values_list('id', 'title', 'description', 'date'))
+    bookings = list(Booking.objects.order_by().values_list('user_id', 'event_id'))
+    stored = stored_neighbours()
+    neighbours = refresh_neighbours(events, bookings, stored, changed_ids, k, text_weight, now=started_at)
+    return save_neighbours(neighbours, stored, started_at, len(events), len(bookings), full=False)
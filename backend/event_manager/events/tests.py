@@ -1,3 +1,724 @@
-from django.test import TestCase
+import gzip
+import json
+import random
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.test import APIClient, APIRequestFactory
+
+from event_manager import startup
+from event_manager.cache import LockingFileBasedCache
+from event_manager.middleware import CompressionMiddleware, brotli
+from events import geo, lifecycle, similarity
+from events.admission import AdmissionController, SoldOut, QueueFull, get_controller
+from events.models import Event, Booking, SimilarityBuild
+from events.serializers import EventSerializer, EventListSerializer, BookingSerializer
+from events.throttling import MemoryTokenBucketStore, CacheTokenBucketStore, TokenBucketThrottle, get_store
+
+
+# Admission state (written by the Event post_save signal) and cache-backed
+# throttle buckets go to per-process LocMem caches, emptied after every
+# test, instead of the on-disk `shared` cache. Event pks repeat between
+# test databases, so state left there would leak into the next run.
+TEST_CACHES = {
+    alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'test-{alias}'}
+    for alias in ('default', 'shared', 'throttle')
+}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CacheIsolatedTestCase(TestCase):
+    def tearDown(self):
+        for alias in TEST_CACHES:
+            caches[alias].clear()
+        super().tearDown()
+
+
+class StartupTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.results = startup.compare_profiles(runs=7)
+
+    def test_profiles_serve_first_request(self):
+        for name, result in self.results.items():
+            with self.subTest(profile=name):
+                self.assertEqual(result['status'], '401 Unauthorized')
+
+    def test_api_profile_skips_unused_modules(self):
+        modules = set(self.results['api']['modules'])
+        for module in startup.API_FORBIDDEN_MODULES:
+            with self.subTest(module=module):
+                self.assertNotIn(module, modules)
+
+    def test_api_profile_loads_fewer_modules(self):
+        self.assertLess(self.results['api']['module_count'], self.results['full']['module_count'])
+
+    @skipUnless(startup.API_MODULE_BUDGET, 'STARTUP_MODULE_BUDGET not set')
+    def test_api_profile_module_budget(self):
+        self.assertLessEqual(self.results['api']['module_count'], startup.API_MODULE_BUDGET)
+
+    def test_api_profile_starts_faster(self):
+        # Paired runs, so a slow spell on the machine slows both sides
+        differences = [
+            api - full for api, full in zip(
+                self.results['api']['first_response_runs'],
+                self.results['full']['first_response_runs']
+            )
+        ]
+        self.assertLess(statistics.median(differences), 0)
+
+    @skipUnless(startup.STARTUP_BUDGET_SECONDS, 'STARTUP_BUDGET_SECONDS not set')
+    def test_startup_time_budget(self):
+        self.assertLessEqual(self.results['api']['first_response_seconds'], startup.STARTUP_BUDGET_SECONDS)
+
+
+class AdmissionControllerTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = LocMemCache(f'admission-{id(self)}', {})
+        self.controller = AdmissionController(cache=self.cache, max_in_flight=2)
+        self.event = SimpleNamespace(pk=1, tickets_available=10)
+        self.controller.sync(self.event)
+
+    def queue(self, ticket=None):
+        with self.assertRaises(QueueFull) as raised:
+            self.controller.admit(self.event.pk, ticket)
+        return raised.exception
+
+    def test_sold_out_marker_expires(self):
+        self.event.tickets_available = 0
+        self.controller.sync(self.event)
+        with self.assertRaises(SoldOut):
+            self.controller.admit(self.event.pk)
+
+        # A marker no worker cleared must not outlive SOLD_OUT_TTL
+        later = time.time() + self.controller.sold_out_ttl + 1
+        with mock.patch('time.time', return_value=later):
+            self.assertFalse(self.controller.is_sold_out(self.event.pk))
+
+    def test_caps_in_flight_transactions(self):
+        first = self.controller.admit(self.event.pk)
+        self.controller.admit(self.event.pk)
+        self.queue()
+
+        first.release()
+        self.assertEqual(self.controller.in_flight(self.event.pk), 1)
+
+    def test_admits_in_ticket_order(self):
+        first = self.controller.admit(self.event.pk)
+        self.controller.admit(self.event.pk)
+        front = self.queue()
+        back = self.queue()
+        self.assertEqual((front.position, back.position), (1, 2))
+
+        first.release()
+        # A newcomer cannot take the freed slot ahead of the queue
+        self.assertEqual(self.queue().position, 2)
+        # Nor can the second ticket, and its position has not got worse
+        self.assertEqual(self.queue(back.ticket).position, 1)
+        self.controller.admit(self.event.pk, front.ticket)
+
+    def test_unused_tickets_do_not_stall_queue(self):
+        slots = [self.controller.admit(self.event.pk) for _ in range(2)]
+        for _ in range(3):
+            self.queue()
+        waiting = self.queue()
+        self.assertEqual(waiting.position, 4)
+
+        for slot in slots:
+            slot.release()
+        # The called tickets keep their turn for a while...
+        self.assertEqual(self.queue(waiting.ticket).position, 2)
+        # ...then the unclaimed slot goes to whoever is still waiting
+        later = time.time() + self.controller.turn_seconds
+        with mock.patch('time.time', return_value=later):
+            self.controller.admit(self.event.pk, waiting.ticket)
+
+    def test_forged_ticket_joins_back_of_queue(self):
+        for _ in range(2):
+            self.controller.admit(self.event.pk)
+        self.queue()
+        forged = self.controller.sign_ticket(self.event.pk, 1)[:-1] + '0'
+        self.assertEqual(self.queue(forged).position, 2)
+        other_event = self.controller.sign_ticket(2, 1)
+        self.assertEqual(self.queue(other_event).position, 3)
+
+    def test_slot_leases_expire(self):
+        # Both holders die mid-booking and never release
+        for _ in range(2):
+            self.controller.admit(self.event.pk)
+        waiting = self.queue()
+
+        later = time.time() + self.controller.slot_lease + 1
+        with mock.patch('time.time', return_value=later):
+            self.assertEqual(self.controller.in_flight(self.event.pk), 0)
+            slot = self.controller.admit(self.event.pk, waiting.ticket)
+            self.controller.admit(self.event.pk)
+        self.assertEqual(self.controller.in_flight(self.event.pk), 2)
+        slot.release()
+        self.assertEqual(self.controller.in_flight(self.event.pk), 1)
+
+    def test_expired_lease_does_not_free_new_holder(self):
+        stale = self.controller.admit(self.event.pk)
+        self.controller.admit(self.event.pk)
+
+        later = time.time() + self.controller.slot_lease + 1
+        with mock.patch('time.time', return_value=later):
+            self.controller.admit(self.event.pk)
+            self.controller.admit(self.event.pk)
+            stale.release()
+            self.assertEqual(self.controller.in_flight(self.event.pk), 2)
+
+    def test_sync_drops_slots_above_new_limit(self):
+        slots = [self.controller.admit(self.event.pk) for _ in range(2)]
+        self.event.tickets_available = 1
+        self.controller.sync(self.event)
+        self.assertEqual(self.controller.in_flight(self.event.pk), 1)
+        self.queue()
+        slots[0].release()
+        self.controller.admit(self.event.pk)
+
+
+class LockingFileBasedCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.cache = LockingFileBasedCache(directory, {})
+
+    def test_concurrent_incr_loses_no_updates(self):
+        self.cache.set('counter', 0, 60)
+
+        def work():
+            for _ in range(50):
+                self.cache.incr('counter')
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.cache.get('counter'), 400)
+
+    def test_incr_keeps_expiry(self):
+        self.cache.set('counter', 1, 60)
+        self.assertEqual(self.cache.incr('counter', 2), 3)
+        with mock.patch('time.time', return_value=time.time() + 61):
+            self.assertIsNone(self.cache.get('counter'))
+            with self.assertRaises(ValueError):
+                self.cache.incr('counter')
+
+    def test_add_only_sets_missing_keys(self):
+        self.assertTrue(self.cache.add('key', 1))
+        self.assertFalse(self.cache.add('key', 2))
+        self.assertEqual(self.cache.get('key'), 1)
+
+
+class GeohashTests(SimpleTestCase):
+    def test_encode_matches_reference(self):
+        self.assertEqual(geo.encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(geo.encode(-90.0, -180.0, 5), '00000')
+
+    def test_decode_bounds_contains_encoded_point(self):
+        rng = random.Random(1)
+        for _ in range(500):
+            latitude, longitude = rng.uniform(-90, 90), rng.uniform(-180, 180)
+            for precision in (1, 5, 9):
+                geohash = geo.encode(latitude, longitude, precision)
+                min_lat, min_lng, max_lat, max_lng = geo.decode_bounds(geohash)
+                self.assertTrue(min_lat <= latitude <= max_lat)
+                self.assertTrue(min_lng <= longitude <= max_lng)
+                lat_deg, lng_deg = geo.cell_size(precision)
+                self.assertAlmostEqual(max_lat - min_lat, lat_deg)
+                self.assertAlmostEqual(max_lng - min_lng, lng_deg)
+                # The cell's center encodes back to the same cell
+                center = geo.encode((min_lat + max_lat) / 2, (min_lng + max_lng) / 2, precision)
+                self.assertEqual(center, geohash)
+
+    def test_prefix_upper_bound(self):
+        self.assertEqual(geo.prefix_upper_bound('u4p'), 'u4q')
+        self.assertEqual(geo.prefix_upper_bound('u4z'), 'u5')
+        self.assertEqual(geo.prefix_upper_bound('bzz'), 'c')
+        self.assertIsNone(geo.prefix_upper_bound('zzz'))
+        self.assertIsNone(geo.prefix_upper_bound(''))
+
+        upper = geo.prefix_upper_bound('u4z')
+        for geohash in ('u4z', 'u4z0', 'u4zzzzzzz'):
+            self.assertTrue('u4z' <= geohash < upper)
+        self.assertFalse('u4z' <= 'u4y' < upper)
+        self.assertFalse('u4z' <= 'u50' < upper)
+
+    def test_neighbours_wrap_antimeridian(self):
+        east = geo.encode(0.0, 179.99, 4)
+        cells = geo.neighbours(east)
+        self.assertEqual(len(cells), 9)
+        self.assertIn(geo.encode(0.0, -179.99, 4), cells)
+
+    def test_neighbours_stop_at_poles(self):
+        cells = geo.neighbours(geo.encode(89.99, 0.0, 4))
+        self.assertEqual(len(cells), 6)
+        for cell in cells:
+            min_lat, _, max_lat, _ = geo.decode_bounds(cell)
+            self.assertGreaterEqual(min_lat, 89.0)
+
+    def test_is_valid_point(self):
+        self.assertTrue(geo.is_valid_point(90.0, -180.0))
+        for latitude, longitude in [(91, 0), (0, 181), (float('nan'), 0), (0, float('inf'))]:
+            self.assertFalse(geo.is_valid_point(latitude, longitude))
+
+
+class NearbyTests(CacheIsolatedTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(7)
+        date = timezone.now() + timedelta(days=3)
+        events = []
+        # Around Addis Ababa, and straddling the antimeridian
+        for center_lat, center_lng in [(9.0, 38.7), (0.0, 180.0)]:
+            for i in range(150):
+                event = Event(
+                    title=f'Event {i}',
+                    description='',
+                    date=date,
+                    location='',
+                    latitude=center_lat + rng.uniform(-3, 3),
+                    longitude=geo.wrap_longitude(center_lng + rng.uniform(-3, 3)),
+                    tickets_available=10,
+                )
+                event.geohash = event.compute_geohash()
+                event.lifecycle_state = event.get_status()
+                events.append(event)
+        Event.objects.bulk_create(events)
+
+    def full_scan(self, latitude, longitude, limit, radius_km=geo.MAX_RADIUS_KM):
+        distances = sorted(
+            (geo.haversine_km(latitude, longitude, lat, lng), pk)
+            for pk, lat, lng in Event.objects.values_list('pk', 'latitude', 'longitude')
+        )
+        return [item for item in distances if item[0] <= radius_km][:limit]
+
+    def test_nearest_matches_full_scan(self):
+        for latitude, longitude in [(9.03, 38.74), (6.5, 41.0), (0.1, 179.95), (-1.0, -179.5)]:
+            for limit, radius_km in [(1, None), (10, None), (50, None), (100, 150.0)]:
+                with self.subTest(point=(latitude, longitude), limit=limit, radius=radius_km):
+                    found = geo.nearest(Event.objects.all(), latitude, longitude, limit, radius_km=radius_km)
+                    expected = self.full_scan(latitude, longitude, limit, radius_km or geo.MAX_RADIUS_KM)
+                    self.assertEqual(found, expected)
+
+    def test_bbox_and_limit(self):
+        client = APIClient()
+        response = client.get('/api/events/nearby/', {'bbox': '38,8,39,10', 'limit': -1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+
+        response = client.get('/api/events/nearby/', {'lat': 9.0, 'lng': 38.7, 'limit': 5})
+        self.assertEqual(len(response.data), 5)
+        distances = [event['distance_km'] for event in response.data]
+        self.assertEqual(distances, sorted(distances))
+
+    def test_rejects_invalid_coordinates(self):
+        client = APIClient()
+        for params in [
+            {'lat': 'nan', 'lng': 38.7},
+            {'lat': 95, 'lng': 38.7},
+            {'lat': 9.0, 'lng': 'inf'},
+            {'lat': 9.0, 'lng': 38.7, 'radius': 'inf'},
+            {'lat': 9.0, 'lng': 38.7, 'radius': -5},
+            {'bbox': '38,8,39,nan'},
+            {'bbox': '38,8,190,10'},
+        ]:
+            with self.subTest(params=params):
+                self.assertEqual(client.get('/api/events/nearby/', params).status_code, 400)
+
+
+class TokenBucketTests(SimpleTestCase):
+    def stores(self):
+        return [MemoryTokenBucketStore(shards=2), CacheTokenBucketStore(LocMemCache(f'test-throttle-{id(self)}', {}))]
+
+    def test_capacity_and_refill(self):
+        for store in self.stores():
+            with self.subTest(store=type(store).__name__):
+                # 3 tokens, one every 2 seconds
+                for _ in range(3):
+                    self.assertEqual(store.consume('k', 0.5, 3, now=100.0), (True, 0.0))
+                self.assertEqual(store.consume('k', 0.5, 3, now=100.0), (False, 2.0))
+                self.assertEqual(store.consume('k', 0.5, 3, now=101.0), (False, 1.0))
+                self.assertTrue(store.consume('k', 0.5, 3, now=102.0)[0])
+                self.assertFalse(store.consume('k', 0.5, 3, now=102.0)[0])
+                # Never refills past capacity
+                for _ in range(3):
+                    self.assertTrue(store.consume('k', 0.5, 3, now=1000.0)[0])
+                self.assertFalse(store.consume('k', 0.5, 3, now=1000.0)[0])
+                self.assertTrue(store.consume('other', 0.5, 3, now=1000.0)[0])
+
+    def test_peek_spends_nothing(self):
+        for store in self.stores():
+            with self.subTest(store=type(store).__name__):
+                self.assertEqual(store.peek('k', 1.0, 1, now=0.0), (True, 0.0))
+                store.consume('k', 1.0, 1, now=0.0)
+                self.assertEqual(store.peek('k', 1.0, 1, now=0.5), (False, 0.5))
+                self.assertEqual(store.peek('k', 1.0, 1, now=0.5), (False, 0.5))
+                self.assertTrue(store.consume('k', 1.0, 1, now=1.0)[0])
+
+    def test_sweep_drops_full_buckets(self):
+        store = MemoryTokenBucketStore(shards=1)
+        store.SWEEP_MIN = 10
+        for i in range(9):
+            store.consume(f'idle:{i}', 1.0, 5, now=0.0)
+        for _ in range(5):
+            store.consume('busy', 1.0, 5, now=8.0)
+        # The 10th new bucket sweeps the idle ones, which are full again by now
+        store.consume('new', 1.0, 5, now=8.0)
+        self.assertEqual(set(store.shards[0]), {'busy', 'new'})
+        self.assertFalse(store.consume('busy', 1.0, 5, now=8.0)[0])
+
+    def test_forwarded_for_does_not_change_ip_key(self):
+        factory = APIRequestFactory()
+        throttle = TokenBucketThrottle()
+        keys = {
+            throttle.get_cache_key(
+                Request(factory.post('/', REMOTE_ADDR='203.0.113.7', HTTP_X_FORWARDED_FOR=f'10.0.0.{i}')), None
+            )
+            for i in range(5)
+        }
+        self.assertEqual(keys, {'ip:203.0.113.7'})
+
+
+class LoginThrottleTests(CacheIsolatedTestCase):
+    def setUp(self):
+        get_store().clear()
+        self.addCleanup(get_store().clear)
+
+    def test_owner_can_log_in_while_username_is_flooded(self):
+        User.objects.create_user('alice', password='correct horse')
+        rates = {'login': '100/min', 'login_username': '3/hour'}
+        client = APIClient()
+        with mock.patch.dict(api_settings.DEFAULT_THROTTLE_RATES, rates):
+            attacker = [
+                client.post(
+                    '/api/auth/token/', {'username': 'Alice' if i % 2 else 'alice', 'password': 'guess'},
+                    REMOTE_ADDR='198.51.100.1',
+                ).status_code
+                for i in range(5)
+            ]
+            # The correct password from the attacker's address is refused too
+            refused = client.post(
+                '/api/auth/token/', {'username': 'alice', 'password': 'correct horse'},
+                REMOTE_ADDR='198.51.100.1',
+            )
+            # Successful logins spend nothing, so the owner is never throttled
+            owner = [
+                client.post(
+                    '/api/auth/token/', {'username': 'alice', 'password': 'correct horse'},
+                    REMOTE_ADDR='203.0.113.9',
+                ).status_code
+                for _ in range(5)
+            ]
+        self.assertEqual(attacker, [401, 401, 401, 429, 429])
+        self.assertEqual(refused.status_code, 429)
+        self.assertEqual(owner, [200] * 5)
+
+
+class CacheTokenBucketStoreTests(CacheIsolatedTestCase):
+    @override_settings(EVENT_THROTTLE={'STORE': 'cache'})
+    def test_clear_keeps_admission_state(self):
+        store = get_store()
+        self.assertIsInstance(store, CacheTokenBucketStore)
+        store.consume('login:ip:203.0.113.7', 1.0, 1)
+        caches['shared'].set('admission:1:issued', 5)
+
+        store.clear()
+        self.assertTrue(store.peek('login:ip:203.0.113.7', 1.0, 1)[0])
+        self.assertEqual(caches['shared'].get('admission:1:issued'), 5)
+
+
+class BookingThrottleTests(CacheIsolatedTestCase):
+    def setUp(self):
+        get_store().clear()
+        self.addCleanup(get_store().clear)
+
+    def test_queue_retries_use_queue_rate(self):
+        # One ticket left, so one booking at a time; a dead worker holds it
+        event = Event.objects.create(
+            title='Flash sale', description='', date=timezone.now() + timedelta(days=3),
+            location='', tickets_available=1,
+        )
+        get_controller().admit(event.pk)
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('queued', password='x'))
+        url = f'/api/events/{event.pk}/book_ticket/'
+
+        rates = {'booking': '3/min', 'booking_queue': '100/min'}
+        with mock.patch.dict(api_settings.DEFAULT_THROTTLE_RATES, rates):
+            ticket = client.post(url).data['queue_ticket']
+            for _ in range(10):
+                response = client.post(url, HTTP_X_QUEUE_TICKET=ticket)
+                self.assertEqual(response.status_code, 429)
+                self.assertEqual(response.data['queue_ticket'], ticket)
+
+            # Without a ticket the booking rate applies
+            statuses = [client.post(url).status_code for _ in range(3)]
+            self.assertEqual(statuses, [429, 429, 429])
+            self.assertNotIn('queue_ticket', client.post(url).data)
+
+
+class SimilarityRefreshTests(SimpleTestCase):
+    def setUp(self):
+        rng = random.Random(3)
+        self.now = timezone.now()
+        words = [f'word{i}' for i in range(300)]
+        topics = [rng.sample(words, 15) for _ in range(10)]
+        self.events = [
+            (
+                i,
+                ' '.join(rng.sample(topic, 3)),
+                ' '.join(rng.choices(topic, k=20) + rng.choices(words, k=10)),
+                self.now + timedelta(days=rng.randint(-30, 90)),
+            )
+            for i, topic in enumerate(rng.choices(topics, k=300), start=1)
+        ]
+        self.bookings = list({(rng.randrange(500), rng.randint(1, 300)) for _ in range(2000)})
+        self.stored = similarity.compute_neighbours(self.events, self.bookings, 10, now=self.now)
+        self.rng = rng
+
+    def assertMatchesFullBuild(self, refreshed, expected, event_ids):
+        merged = {**self.stored, **refreshed}
+        for event_id in event_ids:
+            with self.subTest(event=event_id):
+                # Equal scores may come back in either order
+                self.assertEqual(
+                    [score for _, score in similarity.rounded(merged.get(event_id, []))],
+                    [score for _, score in similarity.rounded(expected.get(event_id, []))],
+                )
+
+    def test_new_bookings_match_full_build(self):
+        changed = self.rng.sample(range(1, 301), 15)
+        bookings = self.bookings + [(self.rng.randrange(500), event_id) for event_id in changed for _ in range(3)]
+        refreshed = similarity.refresh_neighbours(self.events, bookings, self.stored, changed, 10, now=self.now)
+        expected = similarity.compute_neighbours(self.events, bookings, 10, now=self.now)
+        self.assertLess(len(refreshed), len(self.events))
+        self.assertMatchesFullBuild(refreshed, expected, expected)
+
+    def test_new_event_gets_neighbours(self):
+        twin = self.events[0]
+        events = self.events + [(301, twin[1], twin[2], self.now + timedelta(days=5))]
+        refreshed = similarity.refresh_neighbours(events, self.bookings, self.stored, [301], 10, now=self.now)
+        expected = similarity.compute_neighbours(events, self.bookings, 10, now=self.now)
+        self.assertEqual(refreshed[301][0][0], twin[0])
+        self.assertEqual(refreshed[twin[0]][0][0], 301)
+        # Other lists keep their old IDF weights until the next full build
+        self.assertMatchesFullBuild(refreshed, expected, [301])
+
+
+class SimilarEndpointTests(CacheIsolatedTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        date = timezone.now() + timedelta(days=3)
+        Event.objects.bulk_create([
+            Event(title=title, description=description, date=date, location='',
+                  tickets_available=10, lifecycle_state=Event.UPCOMING)
+            for title, description in [
+                ('Jazz night', 'live jazz quartet and saxophone'),
+                ('Jazz brunch', 'jazz trio with brunch'),
+                ('Python meetup', 'talks about django and python'),
+            ]
+        ])
+        similarity.build_index(k=5)
+
+    def test_refresh_scores_new_events(self):
+        event = Event.objects.create(
+            title='Python workshop', description='hands-on django and python',
+            date=timezone.now() + timedelta(days=4), location='', tickets_available=10,
+        )
+        build = similarity.refresh_index(k=5)
+        self.assertFalse(build.full)
+        # The new event and the meetup; the jazz events share no words with it
+        self.assertEqual(build.events_updated, 2)
+
+        python = Event.objects.get(title='Python meetup')
+        response = APIClient().get(f'/api/events/{event.pk}/similar/', {'limit': -1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in response.data], [python.pk])
+        self.assertEqual(SimilarityBuild.objects.count(), 2)
+
+    def test_unknown_or_malformed_event(self):
+        client = APIClient()
+        self.assertEqual(client.get('/api/events/abc/similar/').status_code, 404)
+        self.assertEqual(client.get('/api/events/999999/similar/').status_code, 404)
+
+
+class LifecycleTests(CacheIsolatedTestCase):
+    def setUp(self):
+        # Midday UTC, so "today" has room on both sides
+        self.now = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0)
+
+    def create(self, title, offset, state):
+        # bulk_create() skips save(), so the stored state is whatever we give it
+        return Event.objects.bulk_create([Event(
+            title=title, description='', date=self.now + offset, location='',
+            tickets_available=10, lifecycle_state=state,
+        )])[0]
+
+    def states(self):
+        return dict(Event.objects.values_list('title', 'lifecycle_state'))
+
+    def test_advance_applies_due_transitions(self):
+        self.create('started', -timedelta(hours=1), Event.TODAY)
+        self.create('missed', -timedelta(days=2), Event.UPCOMING)
+        self.create('tonight', timedelta(hours=6), Event.UPCOMING)
+        self.create('next week', timedelta(days=7), Event.UPCOMING)
+
+        self.assertEqual(lifecycle.advance(self.now, batch_size=1), {Event.PAST: 2, Event.TODAY: 1})
+        self.assertEqual(self.states(), {
+            'started': Event.PAST,
+            'missed': Event.PAST,
+            'tonight': Event.TODAY,
+            'next week': Event.UPCOMING,
+        })
+        self.assertEqual(lifecycle.next_transition(self.now), self.now + timedelta(hours=6))
+        self.assertEqual(lifecycle.advance(self.now), {Event.PAST: 0, Event.TODAY: 0})
+
+        # After tonight's event starts, the next wake-up is midnight
+        later = self.now + timedelta(hours=7)
+        self.assertEqual(lifecycle.advance(later), {Event.PAST: 1, Event.TODAY: 0})
+        self.assertEqual(lifecycle.next_transition(later), lifecycle.start_of_tomorrow(self.now))
+
+    def test_rebuild_fixes_wrong_states(self):
+        self.create('past', -timedelta(days=1), Event.UPCOMING)
+        self.create('today', timedelta(hours=2), Event.PAST)
+        self.create('upcoming', timedelta(days=3), Event.TODAY)
+        self.create('correct', timedelta(days=4), Event.UPCOMING)
+
+        moved = lifecycle.rebuild(self.now)
+        self.assertEqual(sum(moved.values()), 3)
+        self.assertEqual(self.states(), {
+            'past': Event.PAST,
+            'today': Event.TODAY,
+            'upcoming': Event.UPCOMING,
+            'correct': Event.UPCOMING,
+        })
+
+    def test_booking_checks_date_when_state_lags(self):
+        self.now = timezone.now()
+        event = self.create('stale', -timedelta(minutes=5), Event.TODAY)
+        user = User.objects.create_user('stale-state', password='x')
+        booking = Booking.objects.create(user=user, event=event)
+
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.post(f'/api/events/{event.pk}/book_ticket/', {'tickets_count': 1})
+        self.assertEqual(response.status_code, 400)
+        response = client.delete(f'/api/bookings/{booking.pk}/')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Event.objects.get(pk=event.pk).tickets_available, 10)
+
+
+class SparseFieldsTests(SimpleTestCase):
+    def request(self, fields):
+        return Request(APIRequestFactory().get('/api/', {'fields': fields}))
+
+    def test_every_field_maps_to_model_columns(self):
+        for serializer_class, queryset in [
+            (EventSerializer, Event.objects.all()),
+            (EventListSerializer, Event.objects.all()),
+            (BookingSerializer, Booking.objects.select_related('event')),
+        ]:
+            for name in serializer_class().fields:
+                with self.subTest(serializer=serializer_class.__name__, field=name):
+                    sparse = serializer_class.sparse_queryset(queryset, self.request(name))
+                    # Compiling the SQL fails on a field that isn't a column
+                    str(sparse.query)
+
+    def test_output_and_columns_are_trimmed(self):
+        request = self.request('id,title,can_book,unknown')
+        sparse = EventListSerializer.sparse_queryset(Event.objects.all(), request)
+        self.assertEqual(
+            sparse.query.deferred_loading,
+            ({'id', 'title', 'lifecycle_state', 'tickets_available'}, False)
+        )
+        self.assertEqual(
+            set(EventListSerializer(context={'request': request}).fields),
+            {'id', 'title', 'can_book'}
+        )
+
+
+class CompactResponseTests(CacheIsolatedTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        date = timezone.now() + timedelta(days=3)
+        Event.objects.bulk_create([
+            Event(title=f'Event {i}', description='A long description. ' * 5, date=date,
+                  location='Addis Ababa', tickets_available=10, lifecycle_state=Event.UPCOMING)
+            for i in range(20)
+        ])
+
+    def test_msgpack_is_negotiated(self):
+        import msgpack
+
+        client = APIClient()
+        expected = json.loads(client.get('/api/events/').content)
+        for kwargs in [{'HTTP_ACCEPT': 'application/msgpack'}, {'data': {'format': 'msgpack'}}]:
+            with self.subTest(**kwargs):
+                response = client.get('/api/events/', **kwargs)
+                self.assertEqual(response['Content-Type'], 'application/msgpack')
+                self.assertEqual(msgpack.unpackb(response.content), expected)
+
+    def test_gzip_above_threshold(self):
+        plain = APIClient().get('/api/events/')
+        self.assertGreater(len(plain.content), settings.RESPONSE_COMPRESSION_MIN_BYTES)
+        self.assertFalse(plain.has_header('Content-Encoding'))
+
+        response = APIClient().get('/api/events/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+    @skipUnless(brotli, 'brotli not installed')
+    def test_brotli_preferred(self):
+        plain = APIClient().get('/api/events/')
+        response = APIClient().get('/api/events/', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), plain.content)
+
+    def test_small_responses_are_not_compressed(self):
+        event = Event.objects.first()
+        response = APIClient().get(f'/api/events/{event.pk}/', {'fields': 'id'}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertLess(len(response.content), settings.RESPONSE_COMPRESSION_MIN_BYTES)
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    @override_settings(RESPONSE_COMPRESSION_MIN_BYTES=1)
+    def test_auth_endpoints_are_not_compressed(self):
+        client = APIClient()
+        response = client.post('/api/auth/token/', {'username': 'nobody', 'password': 'x'},
+                               HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        # Same threshold elsewhere does compress
+        response = client.get('/api/events/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_strong_etag_is_weakened(self):
+        def view(request):
+            response = HttpResponse(b'x' * 4096)
+            response['ETag'] = '"abc"'
+            return response
+
+        request = RequestFactory().get('/api/events/', HTTP_ACCEPT_ENCODING='gzip')
+        response = CompressionMiddleware(view)(request)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['ETag'], 'W/"abc"')
@@ -0,0 +1,265 @@
+import threading
+import time
+import zlib
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from .admission import get_controller, request_ticket
+
+# Token-bucket throttling for booking, registration and login.
+#
+# Each (scope, user or IP) pair owns a bucket holding up to `capacity`
+# tokens that refills at `rate` tokens per second; a request spends one
+# token. Unlike DRF's SimpleRateThrottle, which keeps a timestamp list per
+# client, a check is O(1) whatever the traffic. Rates reuse DRF's
+# DEFAULT_THROTTLE_RATES format ('10/min'), the bucket size being the
+# request count of the period.
+#
+# Anonymous clients are keyed by DRF's get_ident(), which only trusts
+# X-Forwarded-For up to REST_FRAMEWORK['NUM_PROXIES'] hops. Set it to the
+# number of reverse proxies in front of the app (NUM_PROXIES env var);
+# with the default 0 the key is REMOTE_ADDR and a client-supplied header
+# cannot give each request a fresh bucket.
+
+DEFAULTS = {
+    # 'memory': sharded in-process store; 'cache': Django cache (shared)
+    'STORE': 'memory',
+    # Own alias: CacheTokenBucketStore.clear() empties the whole cache
+    'CACHE_ALIAS': 'throttle',
+    'SHARDS': 16,
+}
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def get_setting(name):
+    return getattr(settings, 'EVENT_THROTTLE', {}).get(name, DEFAULTS[name])
+
+
+_parsed_rates = {}
+
+
+# '10/min' -> (tokens per second, capacity)
+def parse_rate(rate):
+    if rate is None:
+        return None
+    if rate not in _parsed_rates:
+        num, period = rate.split('/')
+        capacity = int(num)
+        _parsed_rates[rate] = (capacity / PERIODS[period[0]], capacity)
+    return _parsed_rates[rate]
+
+
+def refill(tokens, last, now, rate, capacity):
+    return min(capacity, tokens + (now - last) * rate)
+
+
+class MemoryTokenBucketStore:
+    """Buckets in per-process dicts, split across shards to limit lock contention."""
+
+    # Sweep a shard of idle (full) buckets after this many new buckets
+    SWEEP_MIN = 1024
+
+    def __init__(self, shards=16):
+        self.shards = [{} for _ in range(shards)]
+        self.locks = [threading.Lock() for _ in range(shards)]
+        self.added = [0] * shards
+
+    def consume(self, key, rate, capacity, now=None):
+        now = time.monotonic() if now is None else now
+        index = zlib.crc32(key.encode()) % len(self.shards)
+        shard = self.shards[index]
+
+        with self.locks[index]:
+            bucket = shard.get(key)
+            if bucket is None:
+                tokens = capacity
+                self.added[index] += 1
+                if self.added[index] >= max(self.SWEEP_MIN, len(shard)):
+                    self.sweep(shard, now)
+                    self.added[index] = 0
+            else:
+                tokens = refill(bucket[0], bucket[1], now, rate, capacity)
+
+            if tokens >= 1:
+                shard[key] = (tokens - 1, now, rate, capacity)
+                return True, 0.0
+            shard[key] = (tokens, now, rate, capacity)
+            return False, (1 - tokens) / rate
+
+    def peek(self, key, rate, capacity, now=None):
+        """Whether consume() would succeed, without spending a token."""
+        now = time.monotonic() if now is None else now
+        index = zlib.crc32(key.encode()) % len(self.shards)
+        with self.locks[index]:
+            bucket = self.shards[index].get(key)
+        tokens = capacity if bucket is None else refill(bucket[0], bucket[1], now, rate, capacity)
+        return tokens >= 1, max(0.0, (1 - tokens) / rate)
+
+    # Drop buckets that have refilled completely; they equal a new bucket.
+    # Runs at most once per len(shard) new buckets, so it is O(1) amortised.
+    def sweep(self, shard, now):
+        for key in [
+            key for key, (tokens, last, rate, capacity) in shard.items()
+            if refill(tokens, last, now, rate, capacity) >= capacity
+        ]:
+            del shard[key]
+
+    def clear(self):
+        for lock, shard in zip(self.locks, self.shards):
+            with lock:
+                shard.clear()
+
+
+class CacheTokenBucketStore:
+    """
+    Buckets in a Django cache, shared by every worker using that cache.
+
+    The read-modify-write is not atomic, so concurrent requests from one
+    client can occasionally both spend the last token. clear() empties the
+    whole cache, so the cache should hold nothing but buckets (the
+    `throttle` alias by default).
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def consume(self, key, rate, capacity, now=None):
+        now = time.time() if now is None else now
+        cache_key = f'throttle:{key}'
+        bucket = self.cache.get(cache_key)
+        tokens = capacity if bucket is None else refill(bucket[0], bucket[1], now, rate, capacity)
+
+        # Expire once the bucket would be full again
+        timeout = int(capacity / rate) + 1
+        if tokens >= 1:
+            self.cache.set(cache_key, (tokens - 1, now), timeout)
+            return True, 0.0
+        self.cache.set(cache_key, (tokens, now), timeout)
+        return False, (1 - tokens) / rate
+
+    def peek(self, key, rate, capacity, now=None):
+        now = time.time() if now is None else now
+        bucket = self.cache.get(f'throttle:{key}')
+        tokens = capacity if bucket is None else refill(bucket[0], bucket[1], now, rate, capacity)
+        return tokens >= 1, max(0.0, (1 - tokens) / rate)
+
+    def clear(self):
+        self.cache.clear()
+
+
+_memory_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _memory_store
+    if get_setting('STORE') == 'cache':
+        return CacheTokenBucketStore(caches[get_setting('CACHE_ALIAS')])
+    if _memory_store is None:
+        with _store_lock:
+            if _memory_store is None:
+                _memory_store = MemoryTokenBucketStore(get_setting('SHARDS'))
+    return _memory_store
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Throttle keyed by user (when authenticated) or client IP.
+
+    The scope comes from the view's `throttle_scope` (set per action with
+    @action(..., throttle_scope='booking')) or the class `scope`; its rate
+    is looked up in REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']. Scopes
+    without a rate are not throttled.
+    """
+
+    scope = None
+
+    def get_scope(self, view):
+        return getattr(view, 'throttle_scope', None) or self.scope
+
+    def get_cache_key(self, request, view):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return f'user:{user.pk}'
+        return f'ip:{self.get_ident(request)}'
+
+    def allow_request(self, request, view):
+        return self.consume(request, view, self.get_scope(view))
+
+    def consume(self, request, view, scope):
+        rate = parse_rate(api_settings.DEFAULT_THROTTLE_RATES.get(scope))
+        if rate is None:
+            return True
+
+        key = f'{scope}:{self.get_cache_key(request, view)}'
+        allowed, self.wait_seconds = get_store().consume(key, *rate)
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class BookingThrottle(TokenBucketThrottle):
+    """
+    Booking attempts per user. Retries carrying a valid queue ticket are
+    charged to the `booking_queue` scope instead: queued clients retry as
+    often as Retry-After says, and a booking-rate 429 longer than the
+    queue's turn window would cost them their place.
+    """
+
+    scope = 'booking'
+    queue_scope = 'booking_queue'
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(view)
+        try:
+            event_id = int(view.kwargs.get('pk'))
+        except (TypeError, ValueError):
+            event_id = None
+        if event_id is not None and get_controller().ticket_number(event_id, request_ticket(request)) is not None:
+            scope = self.queue_scope
+        return self.consume(request, view, scope)
+
+
+class RegisterThrottle(TokenBucketThrottle):
+    scope = 'register'
+
+
+class LoginThrottle(TokenBucketThrottle):
+    """
+    Login attempts per client IP, plus failed logins per (username, IP)
+    under the `login_username` scope. Only failures spend from the username
+    bucket (see record_failure(), called by LoginView), and the bucket is
+    per address, so flooding someone's username cannot lock its owner out.
+    """
+
+    scope = 'login'
+    username_scope = 'login_username'
+
+    def username_bucket(self, request):
+        rate = parse_rate(api_settings.DEFAULT_THROTTLE_RATES.get(self.username_scope))
+        username = request.data.get('username') if hasattr(request.data, 'get') else None
+        if rate is None or not isinstance(username, str) or not username:
+            return None
+        # Usernames are at most 150 characters; longer input is not a real account
+        return f'{self.username_scope}:{username[:150].lower()}:{self.get_ident(request)}', rate
+
+    def allow_request(self, request, view):
+        if not super().allow_request(request, view):
+            return False
+        bucket = self.username_bucket(request)
+        if bucket is None:
+            return True
+        key, rate = bucket
+        allowed, self.wait_seconds = get_store().peek(key, *rate)
+        return allowed
+
+    def record_failure(self, request):
+        bucket = self.username_bucket(request)
+        if bucket is not None:
+            key, rate = bucket
+            get_store().consume(key, *rate)
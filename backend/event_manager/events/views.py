@@ -1,12 +1,18 @@
+import math
 from rest_framework import viewsets, status, permissions
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes, throttle_classes
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.views import TokenObtainPairView
 from django.shortcuts import get_object_or_404
+from django.http import Http404
 from django.db import transaction
 from django.contrib.auth.models import User
-from django.utils import timezone
-from .models import Event, Booking
+from .models import Event, Booking, SimilarEvent
+from .admission import get_controller, request_ticket, SoldOut, QueueFull
+from . import geo
+from .throttling import BookingThrottle, LoginThrottle, RegisterThrottle
 from .serializers import (
     EventSerializer, EventListSerializer, BookingSerializer,
     CreateBookingSerializer, UserSerializer, UserRegisterSerializer
@@ -14,6 +20,8 @@ from .serializers import (
 
 class EventViewSet(viewsets.ModelViewSet):
     queryset = Event.objects.all()
+    # Set per action for the token-bucket throttles (see book_ticket)
+    throttle_scope = None
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -34,26 +42,73 @@ class EventViewSet(viewsets.ModelViewSet):
         
         # Filter by status
         if status_filter == 'upcoming':
-            queryset = queryset.filter(date__gte=timezone.now())
+            queryset = queryset.filter(lifecycle_state__in=Event.NOT_STARTED_STATES)
         elif status_filter == 'past':
-            queryset = queryset.filter(date__lt=timezone.now())
+            queryset = queryset.filter(lifecycle_state=Event.PAST)
         elif not show_past:
             # Default: show only upcoming events
-            queryset = queryset.filter(date__gte=timezone.now())
+            queryset = queryset.filter(lifecycle_state__in=Event.NOT_STARTED_STATES)
             
-        return queryset
+        return self.get_serializer_class().sparse_queryset(queryset, self.request)
 
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy', 'book_ticket']:
             return [permissions.IsAuthenticated()]
         return [permissions.AllowAny()]
 
-    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    @action(
+        detail=True,
+        methods=['post'],
+        permission_classes=[permissions.IsAuthenticated],
+        throttle_classes=[BookingThrottle],
+        throttle_scope='booking'
+    )
     def book_ticket(self, request, pk=None):
+        controller = get_controller()
+        try:
+            event_id = int(pk)
+        except ValueError:
+            raise Http404
+
+        # A queue ticket from an earlier 429 keeps the client's place in line
+        ticket = request_ticket(request)
+
+        # Admission control: answer sold-out and overload without a DB hit
+        try:
+            admission = controller.admit(event_id, ticket)
+        except SoldOut:
+            return Response(
+                {'error': 'This event is sold out'},
+                status=status.HTTP_409_CONFLICT
+            )
+        except QueueFull as e:
+            response = Response({
+                'error': 'Too many bookings in progress. Please try again shortly.',
+                'queue_position': e.position,
+                'queue_ticket': e.ticket,
+                'estimated_wait': round(e.estimated_wait, 2),
+            }, status=status.HTTP_429_TOO_MANY_REQUESTS)
+            response['Retry-After'] = str(max(1, math.ceil(e.estimated_wait)))
+            response['X-Queue-Ticket'] = e.ticket
+            return response
+
+        with admission:
+            return self._book_ticket(request, controller)
+
+    def _book_ticket(self, request, controller):
         event = self.get_object()
-        
-        # Check if event is in the past
-        if event.is_past():
+
+        # Sold out but the marker was missing (e.g. cache restart): set it now
+        if event.tickets_available <= 0:
+            controller.sync(event)
+            return Response(
+                {'error': 'This event is sold out'},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        # Check if event is in the past. The stored state can lag the clock
+        # until the scheduler's next tick, so the date is checked as well
+        if event.lifecycle_state == Event.PAST or event.is_past():
             return Response(
                 {'error': 'Cannot book tickets for past events'}, 
                 status=status.HTTP_400_BAD_REQUEST
@@ -128,13 +183,15 @@ class EventViewSet(viewsets.ModelViewSet):
             
         # Filter by status
         if status_filter == 'upcoming':
-            events = events.filter(date__gte=timezone.now())
+            events = events.filter(lifecycle_state__in=Event.NOT_STARTED_STATES)
         elif status_filter == 'past':
-            events = events.filter(date__lt=timezone.now())
+            events = events.filter(lifecycle_state=Event.PAST)
         elif not show_past:
             # Default: show only upcoming events
-            events = events.filter(date__gte=timezone.now())
+            events = events.filter(lifecycle_state__in=Event.NOT_STARTED_STATES)
             
+        events = EventListSerializer.sparse_queryset(events, request)
+
         # Get the page for pagination
         page = self.paginate_queryset(events)
         if page is not None:
@@ -152,10 +209,107 @@ class EventViewSet(viewsets.ModelViewSet):
         )
         return Response(serializer.data)
 
+    # Nearest upcoming events to ?lat=&lng= (optionally within ?radius= km),
+    # or upcoming events inside ?bbox=min_lng,min_lat,max_lng,max_lat
+    @action(detail=False, methods=['get'])
+    def nearby(self, request):
+        try:
+            limit = max(1, min(int(request.GET.get('limit', 20)), 100))
+            bbox = request.GET.get('bbox')
+            if bbox:
+                min_lng, min_lat, max_lng, max_lat = [float(v) for v in bbox.split(',')]
+            else:
+                latitude = float(request.GET['lat'])
+                longitude = float(request.GET['lng'])
+                radius = request.GET.get('radius')
+                radius = float(radius) if radius else None
+        except (KeyError, ValueError):
+            return Response(
+                {'error': 'Provide lat and lng (and optional radius in km), or bbox=min_lng,min_lat,max_lng,max_lat'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if bbox:
+            if (not geo.is_valid_point(min_lat, min_lng) or not geo.is_valid_point(max_lat, max_lng)
+                    or min_lat > max_lat or min_lng > max_lng):
+                return Response(
+                    {'error': 'Invalid bbox'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        elif not geo.is_valid_point(latitude, longitude):
+            return Response(
+                {'error': 'lat must be within [-90, 90] and lng within [-180, 180]'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        elif radius is not None and not 0 < radius <= geo.MAX_RADIUS_KM:
+            return Response(
+                {'error': f'radius must be greater than 0 and at most {geo.MAX_RADIUS_KM:g} km'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        events = Event.objects.filter(lifecycle_state__in=Event.NOT_STARTED_STATES)
+
+        if bbox:
+            events = EventListSerializer.sparse_queryset(events, request).filter(
+                geo.cells_q(geo.cells_for_bbox(min_lat, min_lng, max_lat, max_lng)),
+                latitude__range=(min_lat, max_lat),
+                longitude__range=(min_lng, max_lng),
+            )[:limit]
+        else:
+            nearest = geo.nearest(events, latitude, longitude, limit, radius_km=radius)
+            by_id = EventListSerializer.sparse_queryset(Event.objects.all(), request).in_bulk(
+                [pk for _, pk in nearest]
+            )
+            events = []
+            for distance, pk in nearest:
+                event = by_id[pk]
+                event.distance_km = round(distance, 2)
+                events.append(event)
+
+        serializer = EventListSerializer(
+            events,
+            many=True,
+            context={'request': request}
+        )
+        return Response(serializer.data)
+
+    # Related upcoming events from the precomputed index (build_similar_events)
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        try:
+            event_id = int(pk)
+        except ValueError:
+            raise Http404
+        try:
+            limit = max(1, min(int(request.GET.get('limit', 10)), 20))
+        except ValueError:
+            limit = 10
+
+        neighbours = SimilarEvent.objects.filter(
+            event_id=event_id,
+            similar__lifecycle_state__in=Event.NOT_STARTED_STATES
+        ).select_related('similar').order_by('rank')[:limit]
+        events = [neighbour.similar for neighbour in neighbours]
+
+        if not events and not Event.objects.filter(pk=event_id).exists():
+            return Response(
+                {'error': 'Event not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        serializer = EventListSerializer(
+            events,
+            many=True,
+            context={'request': request}
+        )
+        return Response(serializer.data)
+
     # New action to get past events
     @action(detail=False, methods=['get'])
     def past_events(self, request):
-        past_events = Event.objects.filter(date__lt=timezone.now())
+        past_events = EventListSerializer.sparse_queryset(
+            Event.objects.filter(lifecycle_state=Event.PAST), request
+        )
         
         page = self.paginate_queryset(past_events)
         if page is not None:
@@ -176,7 +330,9 @@ class EventViewSet(viewsets.ModelViewSet):
     # New action to get upcoming events
     @action(detail=False, methods=['get'])
     def upcoming_events(self, request):
-        upcoming_events = Event.objects.filter(date__gte=timezone.now())
+        upcoming_events = EventListSerializer.sparse_queryset(
+            Event.objects.filter(lifecycle_state__in=Event.NOT_STARTED_STATES), request
+        )
         
         page = self.paginate_queryset(upcoming_events)
         if page is not None:
@@ -199,7 +355,8 @@ class BookingViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Booking.objects.filter(user=self.request.user).select_related('event')
+        queryset = Booking.objects.filter(user=self.request.user).select_related('event')
+        return BookingSerializer.sparse_queryset(queryset, self.request)
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -214,7 +371,7 @@ class BookingViewSet(viewsets.ModelViewSet):
             booking = self.get_object()
             
             # Don't allow cancellation for past events (optional)
-            if booking.event.is_past():
+            if booking.event.lifecycle_state == Event.PAST or booking.event.is_past():
                 return Response(
                     {'error': 'Cannot cancel booking for past events'}, 
                     status=status.HTTP_400_BAD_REQUEST
@@ -242,6 +399,7 @@ class BookingViewSet(viewsets.ModelViewSet):
 
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
+@throttle_classes([RegisterThrottle])
 def register_user(request):
     try:
         serializer = UserRegisterSerializer(data=request.data)
@@ -265,4 +423,17 @@ def register_user(request):
 @permission_classes([permissions.IsAuthenticated])
 def user_profile(request):
     serializer = UserSerializer(request.user)
-    return Response(serializer.data)
\ No newline at end of file
+    return Response(serializer.data)
+
+
+class LoginView(TokenObtainPairView):
+    """JWT login. Wrong credentials are charged to the per-username throttle."""
+
+    throttle_classes = [LoginThrottle]
+
+    def post(self, request, *args, **kwargs):
+        try:
+            return super().post(request, *args, **kwargs)
+        except AuthenticationFailed:
+            LoginThrottle().record_failure(request)
+            raise